@@ -0,0 +1,226 @@
+# End-to-end benchmark: generates a drop of synthetic workbooks, then times the
+# parse, validate, ingest and report stages separately and prints the results
+# as JSON. Run from the `app` directory:
+#
+#   uv run benchmarks/benchmark.py --purchase-orders 100 --output results.json
+#   uv run benchmarks/benchmark.py --baseline results.json
+#
+# ⚠️ Every table in the database named by `--env-file` is truncated first. It
+# defaults to the test database (`docker-compose --profile test up`).
+import argparse
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import json
+import logging
+from os import cpu_count, environ
+from pathlib import Path
+import platform
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR / "src"))
+
+# Settings that change what's measured, recorded with the results.
+SETTINGS = [
+    "PARSE_WORKERS",
+    "READER_BACKEND",
+    "INGEST_METHOD",
+    "INGEST_PIPELINE",
+    "INGEST_CONCURRENCY",
+    "INGEST_BATCH_FILES",
+    "REPORT_WORKERS",
+    "REPORT_BATCH_SIZE",
+    "REPORT_FORMAT",
+    "REPORT_PIPELINE_DEPTH",
+    "REPORT_STREAMING_CHUNK_ROWS",
+]
+
+
+def stage(seconds: float, files: int, rows: int) -> Dict:
+    return {
+        "seconds": round(seconds, 4),
+        "files": files,
+        "rows": rows,
+        "rows_per_second": round(rows / seconds) if seconds else None,
+    }
+
+
+def parse_and_validate(files: List[Path], backend: str) -> Dict[str, Dict]:
+    """
+    Both stages in this process, one file at a time, so they're timed apart
+    and don't depend on the number of cores.
+    """
+    import identifiers
+    import money
+    import readers
+    import validators
+
+    rules = {
+        identifiers.PURCHASE_ORDER: (
+            identifiers.PURCHASE_ORDER_COLUMNS,
+            validators.purchase_order,
+        ),
+        identifiers.INVOICE: (identifiers.INVOICE_COLUMNS, validators.invoice),
+    }
+
+    parse_seconds = validate_seconds = 0.0
+    rows = 0
+    for file in files:
+        start = time.perf_counter()
+        kind = identifiers.by_header(file)
+        df = money.parse_amounts(readers.read(file, backend))
+        parse_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        columns, validate = rules[kind]
+        identifiers.by_columns(df, columns)
+        validate(df)
+        validate_seconds += time.perf_counter() - start
+        rows += len(df)
+
+    return {
+        "parse": stage(parse_seconds, len(files), rows),
+        "validate": stage(validate_seconds, len(files), rows),
+    }
+
+
+def truncate():
+    import commands
+    from models.base import Base
+    from sqlalchemy import text
+
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with commands.engine().begin() as connection:
+        connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+
+
+def ingest_and_report(drop_rows: int) -> Dict[str, Dict]:
+    import commands
+    import config
+
+    files = len(commands.list_input_files())
+    start = time.perf_counter()
+    commands.ingest_input_files()
+    ingest_seconds = time.perf_counter() - start
+    ingested = len(list((config.OUTPUT_DIR / "ingested").iterdir()))
+
+    start = time.perf_counter()
+    reports = commands.generate_reports()
+    report_seconds = time.perf_counter() - start
+
+    return {
+        "ingest": {**stage(ingest_seconds, files, drop_rows), "ingested": ingested},
+        "report": stage(report_seconds, reports, drop_rows),
+    }
+
+
+def regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    found = []
+    for name, measured in results["stages"].items():
+        expected = baseline["stages"].get(name)
+        if expected is None or not expected["seconds"]:
+            continue
+        if measured["seconds"] > expected["seconds"] * (1 + tolerance):
+            found.append(
+                f"{name}: {measured['seconds']}s, baseline {expected['seconds']}s"
+            )
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Time each stage on a synthetic drop.")
+    parser.add_argument("--purchase-orders", type=int, default=50)
+    parser.add_argument("--lines-per-order", type=int, default=50)
+    parser.add_argument("--invoices-per-order", type=int, default=3)
+    parser.add_argument("--mismatch-rate", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--env-file",
+        type=Path,
+        default=APP_DIR / "tests" / ".env.test",
+        help="database settings; every table in it is truncated",
+    )
+    parser.add_argument("--output", type=Path, help="also write the results here")
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        help="results to compare with; exits with 1 if any stage is slower",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="how much slower than the baseline a stage may be (default 0.2, 20%%)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    load_dotenv(args.env_file, override=True)
+
+    with tempfile.TemporaryDirectory() as files_dir:
+        # Before `config` is imported, so the run stays out of `app/files`.
+        environ["FILES_DIR"] = files_dir
+        import config
+        import generators
+
+        for directory in ["ingested", "reports"]:
+            (config.OUTPUT_DIR / directory).mkdir(parents=True)
+
+        start = time.perf_counter()
+        drop = generators.generate_drop(
+            config.INPUT_DIR,
+            args.purchase_orders,
+            args.lines_per_order,
+            args.invoices_per_order,
+            args.mismatch_rate,
+            args.error_rate,
+            args.seed,
+        )
+        generate_seconds = time.perf_counter() - start
+        files = drop.purchase_orders + drop.invoices
+
+        stages = parse_and_validate(files, config.READER_BACKEND)
+        truncate()
+        stages.update(ingest_and_report(drop.rows))
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "cpus": cpu_count(),
+        "drop": {
+            "purchase_orders": args.purchase_orders,
+            "lines_per_order": args.lines_per_order,
+            "invoices_per_order": args.invoices_per_order,
+            "mismatch_rate": args.mismatch_rate,
+            "error_rate": args.error_rate,
+            "seed": args.seed,
+            "files": len(files),
+            "invalid_files": len(drop.invalid),
+            "rows": drop.rows,
+            "generate_seconds": round(generate_seconds, 4),
+        },
+        "settings": {name: environ[name] for name in SETTINGS if name in environ},
+        "stages": stages,
+    }
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        args.output.write_text(output + "\n")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["drop"]["files"] != results["drop"]["files"]:
+            logging.warning("The baseline was measured on a different drop")
+        found = regressions(results, baseline, args.tolerance)
+        for regression in found:
+            logging.error(f"Slower than the baseline: {regression}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
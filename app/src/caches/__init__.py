@@ -0,0 +1,13 @@
+from .caches import (
+    CachedFrame,
+    evict,
+    has_report,
+    key,
+    link_report,
+    load_frame,
+    remove,
+    size,
+    store_frame,
+    store_report,
+    touch,
+)
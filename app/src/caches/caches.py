@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import pandas as pd
+from pathlib import Path
+import shutil
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+################################################################################
+# Entries
+################################################################################
+# Every cache is a directory of entries (files or directories) named after
+# their key. An entry's modification time is when it was last used.
+def key(*parts) -> str:
+    """
+    Cache key for any JSON serializable parts.
+    """
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def touch(entry: Path):
+    """
+    Mark the entry as just used, so it's evicted last.
+    """
+    os.utime(entry)
+
+
+def _remove(path: Path):
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def remove(directory: Path, key: str):
+    """
+    Remove the entry stored under `key`, if any.
+    """
+    for entry in directory.glob(f"{key}*"):
+        _remove(entry)
+
+
+def evict(directory: Path, max_bytes: int) -> List[Path]:
+    """
+    Remove the least recently used entries until the cache fits in
+    `max_bytes`. Returns the removed entries.
+    """
+    if not directory.exists():
+        return []
+
+    entries = []
+    for entry in directory.iterdir():
+        if entry.name.startswith("."):
+            continue
+        try:
+            entries.append((entry.stat().st_mtime, size(entry), entry))
+        except FileNotFoundError:
+            # Evicted by another process.
+            continue
+
+    total = sum(entry_size for _, entry_size, _ in entries)
+    removed = []
+    for _, entry_size, entry in sorted(entries, key=lambda x: x[0]):
+        if total <= max_bytes:
+            break
+        _remove(entry)
+        total -= entry_size
+        removed.append(entry)
+    return removed
+
+
+################################################################################
+# Reports
+################################################################################
+# A report entry is a directory holding the report's outputs (see `sinks`)
+# renamed to `report` + their suffix: `report.xlsx`, `report/summary.csv`, ...
+REPORT = "report"
+
+
+def _link(source: Path, destination: Path):
+    if source.is_dir():
+        destination.mkdir(parents=True, exist_ok=True)
+        for file in source.iterdir():
+            _link(file, destination / file.name)
+    else:
+        os.link(source, destination)
+
+
+def store_report(directory: Path, key: str, path: Path, outputs: Iterable[Path]):
+    """
+    Add a report's outputs, written to `path` plus a suffix, to the cache
+    under `key`. They're stored as hard links, so the cache costs no extra
+    disk space while the outputs exist.
+    """
+    entry = directory / key
+    if entry.exists():
+        return
+
+    # Built under a temporary name and renamed into place, so other processes
+    # never see a partial entry.
+    temporary = directory / f".{key}.{os.getpid()}"
+    temporary.mkdir(parents=True)
+    for output in set(outputs):
+        _link(output, temporary / (REPORT + output.name[len(path.name) :]))
+    try:
+        temporary.rename(entry)
+    except OSError:
+        # Another process stored the same report first.
+        _remove(temporary)
+
+
+def has_report(directory: Path, key: str) -> bool:
+    """
+    Whether a report is cached under `key`. It can still be evicted before
+    it's linked, see `link_report`.
+    """
+    return (directory / key).is_dir()
+
+
+def link_report(directory: Path, key: str, path: Path) -> Optional[List[Path]]:
+    """
+    Hard link the cached outputs stored under `key` to `path` (the report's
+    path without an extension, as passed to the sinks). Returns the linked
+    outputs, or None if there's no such entry.
+    """
+    entry = directory / key
+    outputs = []
+    try:
+        touch(entry)
+        for item in entry.iterdir():
+            output = path.parent / (path.name + item.name[len(REPORT) :])
+            outputs.append(output)
+            _link(item, output)
+    except FileNotFoundError:
+        # Not cached, or evicted while it was being linked. Partial outputs
+        # are removed so the report can be written from scratch; writing
+        # through a hard link would change the cached copy too.
+        for output in outputs:
+            _remove(output)
+        return None
+    return outputs
+
+
+################################################################################
+# Frames
+################################################################################
+# A frame entry is a Feather file (`<key>.feather`): the data frame plus a few
+# string attributes kept in the file's schema metadata. Needs pyarrow.
+class CachedFrame(NamedTuple):
+    df: pd.DataFrame
+    attributes: Dict[str, str]
+
+
+def _frame_entry(directory: Path, key: str) -> Path:
+    return directory / f"{key}.feather"
+
+
+def store_frame(directory: Path, key: str, df: pd.DataFrame, **attributes: str):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.Table.from_pandas(df)
+    table = table.replace_schema_metadata(
+        {
+            **table.schema.metadata,
+            **{name.encode(): value.encode() for name, value in attributes.items()},
+        }
+    )
+
+    # Written under a temporary name and renamed into place, so other
+    # processes never read a partial entry.
+    directory.mkdir(parents=True, exist_ok=True)
+    temporary = directory / f".{key}.{os.getpid()}"
+    feather.write_feather(table, temporary)
+    temporary.replace(_frame_entry(directory, key))
+
+
+def load_frame(
+    directory: Path, key: str, attributes: Iterable[str] = ()
+) -> Optional[CachedFrame]:
+    """
+    The frame stored under `key` and the requested `attributes`, or None if
+    there's no such entry. An entry that can't be read is removed, so the
+    frame is built again rather than failing until it's evicted.
+    """
+    import pyarrow.feather as feather
+
+    entry = _frame_entry(directory, key)
+    try:
+        touch(entry)
+    except FileNotFoundError:
+        return None
+
+    try:
+        table = feather.read_table(entry, memory_map=True)
+        metadata = table.schema.metadata
+        return CachedFrame(
+            table.to_pandas(),
+            {name: metadata[name.encode()].decode() for name in attributes},
+        )
+    except Exception:
+        # Truncated, corrupt, or evicted while it was being read.
+        remove(directory, key)
+        return None
@@ -0,0 +1,13 @@
+from .commands import (
+    engine,
+    export_metrics,
+    generate_reports,
+    ingest_and_report,
+    ingest_files,
+    ingest_files_async,
+    ingest_input_files,
+    list_input_files,
+    validate_files,
+    verify_invoiced_items,
+    watch,
+)
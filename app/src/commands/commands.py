@@ -0,0 +1,977 @@
+import caches
+from config import (
+    INPUT_DIR,
+    OUTPUT_DIR,
+    REPORT_CACHE_DIR,
+    PARSE_CACHE_DIR,
+    PARSE_WORKERS,
+    READER_BACKEND,
+    STREAMING_THRESHOLD_BYTES,
+    STREAMING_CHUNK_ROWS,
+    PARSE_CACHE_BYTES,
+    INGEST_BULK,
+    INGEST_BATCH_FILES,
+    INGEST_BATCH_ROWS,
+    INGEST_BATCH_BYTES,
+    INGEST_ASYNC,
+    INGEST_CONCURRENCY,
+    REPORT_WORKERS,
+    REPORT_BATCH_SIZE,
+    REPORT_CLAIM_TIMEOUT_SECONDS,
+    REPORT_DELTA,
+    REPORT_FORMATS,
+    REPORT_CACHE_BYTES,
+    REPORT_PIPELINE_DEPTH,
+    REPORT_STREAMING_CHUNK_ROWS,
+    METRICS_FILE,
+    METRICS_PORT,
+    SQL_PROFILE,
+    SQL_PROFILE_SLOW_SECONDS,
+    WATCH_POLL_SECONDS,
+)
+import ingestors
+import metrics
+from models import IngestedFile
+import parsers
+import profilers
+import sinks
+import validators
+import watchers
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from functools import cache, partial
+import logging
+from os import cpu_count, environ
+from pathlib import Path
+import queue
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+import threading
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import reports
+
+
+################################################################################
+# Logging
+################################################################################
+def log_excel_file_event(event: str, file: Path) -> str:
+    message = f"[[Excel Event: {event}]] First sheet of file: {file.name}"
+    logging.info(message)
+
+
+################################################################################
+# Metrics
+################################################################################
+def file_kind(file: Path) -> str:
+    """
+    The kind a file is named as, for labelling files that weren't identified.
+    """
+    if file.name.startswith("PurchaseOrder"):
+        return parsers.PURCHASE_ORDER
+    return parsers.INVOICE
+
+
+def record_parsed(parsed: parsers.ParsedFile):
+    """
+    Record the parsing stages timed in the worker process.
+    """
+    kind = metrics.label(parsed.kind or file_kind(parsed.file))
+    outcome = metrics.label(parsed.event) if parsed.event else "ok"
+    rows = len(parsed.df) if parsed.df is not None else 0
+    for stage, seconds in (parsed.timings or {}).items():
+        metrics.record(stage, seconds, rows, kind=kind, outcome=outcome)
+
+
+@contextmanager
+def stage(
+    name: str,
+    file: Optional[Path] = None,
+    purchase_order: Optional[str] = None,
+    **labels,
+) -> Iterator[Dict]:
+    """
+    Time a stage (see `metrics.timer`) and attribute the SQL statements it
+    executes to it, `file` and `purchase_order` (see `profilers.scope`).
+    """
+    with (
+        metrics.timer(name, **labels) as timer_labels,
+        profilers.scope(
+            stage=name,
+            file=file.name if file is not None else None,
+            purchase_order=purchase_order,
+        ),
+    ):
+        yield timer_labels
+
+
+def purchase_order_of(parsed: parsers.ParsedFile) -> Optional[str]:
+    if parsed.df is None:
+        return parsed.purchase_order_id
+    return parsed.df["PO Number"].iat[0]
+
+
+def batch_label(purchase_order_ids: List[str]) -> str:
+    """
+    What the statements of a batch of reports are attributed to: they're
+    shared by the whole batch, so only a batch of one has a purchase order.
+    """
+    if len(purchase_order_ids) == 1:
+        return purchase_order_ids[0]
+    return f"{len(purchase_order_ids)} purchase orders"
+
+
+def export_metrics():
+    """
+    After each run: write the stage metrics, and log the SQL profile of the
+    run.
+    """
+    if METRICS_FILE is not None:
+        metrics.write_textfile(METRICS_FILE)
+    if SQL_PROFILE:
+        logging.info(profilers.summary())
+        profilers.reset()
+
+
+################################################################################
+# DB Connection
+################################################################################
+def database_url(driver: str) -> str:
+    return f"postgresql+{driver}://{environ.get('POSTGRES_USER')}:{environ.get('POSTGRES_PASSWORD')}@{environ.get('POSTGRES_HOST')}:{environ.get('POSTGRES_PORT', 5432)}/{environ.get('POSTGRES_DB')}"
+
+
+@cache
+def engine() -> Engine:
+    """
+    Created on first use, so importing this module doesn't need the
+    database settings.
+    """
+    database = create_engine(database_url("psycopg"))
+    if SQL_PROFILE:
+        profilers.install(database, SQL_PROFILE_SLOW_SECONDS)
+    return database
+
+
+def async_engine() -> AsyncEngine:
+    """
+    A new engine each time: its connections belong to the event loop they
+    were opened on, so one must not outlive its `asyncio.run`.
+    """
+    database = create_async_engine(database_url("psycopg_async"))
+    if SQL_PROFILE:
+        profilers.install(database.sync_engine, SQL_PROFILE_SLOW_SECONDS)
+    return database
+
+
+################################################################################
+# Ingestion
+################################################################################
+def list_input_files() -> List[Path]:
+    """
+    Purchase orders sort first so they're ingested before their invoices.
+    """
+    return sorted(
+        INPUT_DIR.iterdir(),
+        key=lambda x: 0 if x.name.startswith("PurchaseOrder") else 1,
+    )
+
+
+INGESTORS = {
+    parsers.PURCHASE_ORDER: ingestors.purchase_order,
+    parsers.INVOICE: ingestors.invoice,
+}
+STREAM_INGESTORS = {
+    parsers.PURCHASE_ORDER: ingestors.purchase_order_stream,
+    parsers.INVOICE: ingestors.invoice_stream,
+}
+
+
+def ingest(session: Session, parsed: parsers.ParsedFile) -> str:
+    if parsed.df is not None:
+        return INGESTORS[parsed.kind](session, parsed.df, INGEST_BULK)
+
+    chunks = parsers.stream_file(
+        parsed.file, parsed.kind, STREAMING_CHUNK_ROWS, READER_BACKEND
+    )
+    return STREAM_INGESTORS[parsed.kind](session, chunks, INGEST_BULK)
+
+
+def store(
+    session: Session, parsed: parsers.ParsedFile, hash: ingestors.FileHash
+) -> str:
+    """
+    Everything stored for an ingested file: its data, its report job and its
+    hash. Returns the purchase order's id.
+    """
+    purchase_order_id = ingest(session, parsed)
+    reports.enqueue(session, purchase_order_id)
+    ingestors.record_file(session, hash, parsed.file, f"Ingested {parsed.kind}")
+    return purchase_order_id
+
+
+def ingest_labels(parsed: parsers.ParsedFile) -> Dict:
+    return {
+        "kind": metrics.label(parsed.kind),
+        "rows": len(parsed.df) if parsed.df is not None else 0,
+    }
+
+
+class BatchedFile(NamedTuple):
+    parsed: parsers.ParsedFile
+    purchase_order_id: str
+    hash: ingestors.FileHash
+
+
+class Batch:
+    """
+    Files ingested in the current transaction, each inside its own SAVEPOINT
+    so a bad file rolls back alone without losing the rest of the batch.
+    They stay in the input directory until the batch is committed, so
+    whatever stops a batch from being committed, they're picked up again by
+    the next run.
+    """
+
+    def __init__(self):
+        self.files: List[BatchedFile] = []
+        self.rows = 0
+        self.bytes = 0
+
+    def add(self, batched: BatchedFile):
+        self.files.append(batched)
+        if batched.parsed.df is not None:
+            self.rows += len(batched.parsed.df)
+        self.bytes += batched.hash.size
+
+    def is_full(self) -> bool:
+        return (
+            len(self.files) >= INGEST_BATCH_FILES
+            or self.rows >= INGEST_BATCH_ROWS
+            or self.bytes >= INGEST_BATCH_BYTES
+        )
+
+
+def commit_batch(session: Session, batch: Batch):
+    if not batch.files:
+        return
+
+    try:
+        with stage("commit", kind="batch", rows=batch.rows):
+            session.commit()
+    except Exception as e:
+        session.rollback()
+        logging.error(e)
+        for batched in batch.files:
+            log_excel_file_event(
+                f"Failed to Ingest {batched.parsed.kind}", batched.parsed.file
+            )
+        return
+
+    for batched in batch.files:
+        log_excel_file_event(f"Ingested {batched.parsed.kind}", batched.parsed.file)
+        move_ingested(batched.parsed.file)
+        if PARSE_CACHE_BYTES:
+            caches.remove(PARSE_CACHE_DIR, parse_cache_key(batched.hash))
+
+
+def move_ingested(file: Path):
+    """
+    Only once the file's data is committed. Should the move fail, the file is
+    left in the input directory, and moved to the duplicates directory by the
+    next run.
+    """
+    try:
+        ingestors.file(OUTPUT_DIR, file)
+    except Exception as e:
+        logging.error(e)
+
+
+def parse_cache_key(hash: ingestors.FileHash) -> str:
+    return caches.key(hash.sha256, READER_BACKEND)
+
+
+INGESTED_OUTCOMES = {f"Ingested {kind}" for kind in INGESTORS}
+
+
+def skip_duplicates(
+    files: List[Path],
+    hashes: Dict[Path, ingestors.FileHash],
+    known: Dict[str, IngestedFile],
+) -> List[Path]:
+    """
+    Leave out files whose contents were already ingested or rejected (`known`,
+    see `ingestors.ingested_files`), under any name, or that appear earlier in
+    `files`. Copies of ingested files are moved to the duplicates directory;
+    copies of rejected files stay where they are, like the rejected files
+    themselves.
+    """
+    first: Dict[str, Path] = {}
+    remaining = []
+    for file in files:
+        sha256 = hashes[file].sha256
+        earlier = known.get(sha256)
+        if earlier is not None:
+            log_excel_file_event(
+                f"Duplicate of {earlier.file_name}, {earlier.outcome}", file
+            )
+            if earlier.outcome in INGESTED_OUTCOMES:
+                ingestors.duplicate(OUTPUT_DIR, file)
+        elif sha256 in first:
+            log_excel_file_event(f"Duplicate of {first[sha256].name}", file)
+        else:
+            first[sha256] = file
+            remaining.append(file)
+    return remaining
+
+
+def log_rejection(
+    file: Path, event: str, validation: Optional[validators.ValidationResult]
+):
+    log_excel_file_event(event, file)
+    if validation is not None:
+        logging.info(validation.describe())
+
+
+def record_rejection(
+    session: Session, hash: ingestors.FileHash, file: Path, event: str
+):
+    """
+    Rejections only depend on the file's contents, so the same file is
+    rejected without being parsed next time.
+    """
+    with profilers.scope(stage="reject", file=file.name):
+        ingestors.record_file(session, hash, file, event)
+
+
+def named_input_files(input_files: Iterable[Path]) -> List[Path]:
+    files = []
+    for file in input_files:
+        if not validators.validate_file_name(file):
+            logging.info(
+                f'File name does not start with "PurchaseOrder" or "Invoice": {file.name}'
+            )
+            continue
+        files.append(file)
+    return files
+
+
+def ingest_files(
+    input_files: Iterable[Path], executor: Optional[ProcessPoolExecutor] = None
+):
+    files = named_input_files(input_files)
+    hashes = {file: ingestors.file_hash(file) for file in files}
+    with Session(engine()) as session, profilers.scope(stage="deduplicate"):
+        known = ingestors.ingested_files(
+            session, {hash.sha256 for hash in hashes.values()}
+        )
+    files = skip_duplicates(files, hashes, known)
+
+    cache_keys = None
+    if PARSE_CACHE_BYTES:
+        cache_keys = {file: parse_cache_key(hashes[file]) for file in files}
+
+    # Results come back in the same order as `files`, so every purchase order
+    # is still ingested before any invoice.
+    parsed_files = parsers.parse_files(
+        files,
+        PARSE_WORKERS,
+        executor,
+        cache_keys,
+        backend=READER_BACKEND,
+        streaming_threshold=STREAMING_THRESHOLD_BYTES,
+        cache_dir=PARSE_CACHE_DIR if PARSE_CACHE_BYTES else None,
+    )
+    with Session(engine()) as session:
+        batch = Batch()
+        for parsed in parsed_files:
+            file = parsed.file
+            record_parsed(parsed)
+            if parsed.kind is None:
+                log_rejection(file, parsed.event, parsed.validation)
+                if parsed.event != parsers.FAILED_TO_PARSE:
+                    record_rejection(session, hashes[file], file, parsed.event)
+                continue
+
+            log_excel_file_event(f"Ingesting {parsed.kind}", file)
+            try:
+                with (
+                    stage(
+                        "ingest",
+                        file,
+                        purchase_order_of(parsed),
+                        **ingest_labels(parsed),
+                    ),
+                    session.begin_nested(),
+                ):
+                    purchase_order_id = store(session, parsed, hashes[file])
+            except parsers.RejectedFile as e:
+                # A streamed file that turned out to be invalid part way.
+                log_rejection(file, e.event, e.validation)
+                record_rejection(session, hashes[file], file, e.event)
+                continue
+            except Exception as e:
+                log_excel_file_event(f"Failed to Ingest {parsed.kind}", file)
+                logging.error(e)
+                continue
+
+            batch.add(BatchedFile(parsed, purchase_order_id, hashes[file]))
+            if batch.is_full():
+                commit_batch(session, batch)
+                batch = Batch()
+
+        commit_batch(session, batch)
+        # Rejected files recorded since the last batch.
+        session.commit()
+
+    if PARSE_CACHE_BYTES:
+        caches.evict(PARSE_CACHE_DIR, PARSE_CACHE_BYTES)
+
+
+def ingest_input_files(executor: Optional[ProcessPoolExecutor] = None):
+    if INGEST_ASYNC:
+        asyncio.run(ingest_files_async(list_input_files(), executor))
+    else:
+        ingest_files(list_input_files(), executor)
+
+
+################################################################################
+# Async Ingestion
+################################################################################
+async def ingest_files_async(
+    input_files: Iterable[Path], executor: Optional[ProcessPoolExecutor] = None
+):
+    """
+    Same as `ingest_files`, but files are decoded in `executor` while up to
+    `INGEST_CONCURRENCY` earlier ones are written to the database, each in its
+    own transaction on its own connection. Invoices are only written once the
+    purchase orders named before them are, and invoices for the same purchase
+    order one at a time, as they update the same `invoiced_item` rows.
+
+    Each file is handled in its own task, and an error in one is logged
+    without stopping the others.
+    """
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=PARSE_WORKERS) as executor:
+            return await ingest_files_async(input_files, executor)
+
+    files = named_input_files(input_files)
+    hashes = dict(
+        zip(
+            files,
+            await asyncio.gather(
+                *(asyncio.to_thread(ingestors.file_hash, file) for file in files)
+            ),
+        )
+    )
+
+    database = async_engine()
+    try:
+        async with AsyncSession(database) as session:
+            with profilers.scope(stage="deduplicate"):
+                known = await session.run_sync(
+                    ingestors.ingested_files, {hash.sha256 for hash in hashes.values()}
+                )
+        files = skip_duplicates(files, hashes, known)
+
+        parse = partial(
+            parsers.parse_file,
+            backend=READER_BACKEND,
+            streaming_threshold=STREAMING_THRESHOLD_BYTES,
+            cache_dir=PARSE_CACHE_DIR if PARSE_CACHE_BYTES else None,
+        )
+        # Bounds the parsed frames held in memory, like `parsers.parse_files`.
+        parsing = asyncio.Semaphore(2 * (PARSE_WORKERS or cpu_count() or 1))
+        writing = asyncio.Semaphore(INGEST_CONCURRENCY)
+        purchase_order_locks: Dict[str, asyncio.Lock] = {}
+        rejected: List[parsers.ParsedFile] = []
+        loop = asyncio.get_running_loop()
+
+        async def ingest_file(file: Path, after: List[asyncio.Task]):
+            try:
+                await parse_and_write(file, after)
+            except Exception as e:
+                log_excel_file_event(f"Failed to Ingest {file_kind(file)}", file)
+                logging.exception(e)
+
+        async def parse_and_write(file: Path, after: List[asyncio.Task]):
+            async with parsing:
+                cache_key = parse_cache_key(hashes[file]) if PARSE_CACHE_BYTES else None
+                try:
+                    parsed = await loop.run_in_executor(
+                        executor, partial(parse, cache_key=cache_key), file
+                    )
+                except Exception as e:
+                    # Like `parsers.parse_files`.
+                    logging.error(f"{file.name}: {e!r}")
+                    parsed = parsers.ParsedFile(
+                        file, None, None, parsers.FAILED_TO_PARSE
+                    )
+                record_parsed(parsed)
+                if parsed.kind is None:
+                    log_rejection(file, parsed.event, parsed.validation)
+                    rejected.append(parsed)
+                    return
+
+                if parsed.kind == parsers.INVOICE and after:
+                    await asyncio.wait(after)
+                lock = asyncio.Lock()
+                purchase_order_id = purchase_order_of(parsed)
+                if parsed.kind == parsers.INVOICE and purchase_order_id is not None:
+                    lock = purchase_order_locks.setdefault(purchase_order_id, lock)
+                async with writing, lock:
+                    await write_file(database, parsed, hashes[file])
+
+        # `list_input_files` puts purchase orders first.
+        purchase_orders = []
+        tasks = []
+        for file in files:
+            task = asyncio.create_task(ingest_file(file, list(purchase_orders)))
+            if file.name.startswith("PurchaseOrder"):
+                purchase_orders.append(task)
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+
+        rejected = [
+            parsed for parsed in rejected if parsed.event != parsers.FAILED_TO_PARSE
+        ]
+        if rejected:
+            async with AsyncSession(database) as session:
+                for parsed in rejected:
+                    await session.run_sync(
+                        record_rejection,
+                        hashes[parsed.file],
+                        parsed.file,
+                        parsed.event,
+                    )
+                await session.commit()
+    finally:
+        await database.dispose()
+
+    if PARSE_CACHE_BYTES:
+        caches.evict(PARSE_CACHE_DIR, PARSE_CACHE_BYTES)
+
+
+async def write_file(
+    database: AsyncEngine, parsed: parsers.ParsedFile, hash: ingestors.FileHash
+):
+    """
+    Store a parsed file in its own transaction, then move it out of the input
+    directory. Like `commit_batch`, the file is only moved once it's
+    committed, so a task cancelled part way leaves it in the input directory.
+    """
+    file = parsed.file
+    log_excel_file_event(f"Ingesting {parsed.kind}", file)
+    async with AsyncSession(database) as session:
+        try:
+            with stage(
+                "ingest", file, purchase_order_of(parsed), **ingest_labels(parsed)
+            ):
+                await session.run_sync(store, parsed, hash)
+        except parsers.RejectedFile as e:
+            log_rejection(file, e.event, e.validation)
+            await session.rollback()
+            await session.run_sync(record_rejection, hash, file, e.event)
+            await session.commit()
+            return
+        except Exception as e:
+            log_excel_file_event(f"Failed to Ingest {parsed.kind}", file)
+            logging.error(e)
+            return
+
+        try:
+            with stage(
+                "commit", file, purchase_order_of(parsed), **ingest_labels(parsed)
+            ):
+                await session.commit()
+        except Exception as e:
+            log_excel_file_event(f"Failed to Ingest {parsed.kind}", file)
+            logging.error(e)
+            return
+
+    log_excel_file_event(f"Ingested {parsed.kind}", file)
+    await asyncio.to_thread(move_ingested, file)
+    if PARSE_CACHE_BYTES:
+        caches.remove(PARSE_CACHE_DIR, parse_cache_key(hash))
+
+
+################################################################################
+# Reports
+################################################################################
+def generate_reports(executor: Optional[ProcessPoolExecutor] = None) -> int:
+    """
+    Work through the report queue until it's empty, with `REPORT_WORKERS`
+    processes each claiming jobs until there are none left. Any number of
+    processes, on any number of machines, can run this against the same
+    database. Returns the number of reports generated.
+    """
+    unknown = set(REPORT_FORMATS) - set(sinks.SINKS)
+    if unknown:
+        raise ValueError(f"Unknown report format: {', '.join(sorted(unknown))}")
+
+    if REPORT_WORKERS == 1:
+        return report_worker()
+
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=REPORT_WORKERS) as executor:
+            return generate_reports(executor)
+
+    workers = [executor.submit(measured_report_worker) for _ in range(REPORT_WORKERS)]
+    generated = 0
+    for worker in workers:
+        count, snapshot, profile = worker.result()
+        metrics.merge(snapshot)
+        profilers.merge(profile)
+        generated += count
+    return generated
+
+
+def measured_report_worker() -> Tuple[int, metrics.Snapshot, profilers.Profile]:
+    """
+    `report_worker` in a worker process, returning what it recorded along with
+    its count so the parent can export it.
+    """
+    # A forked worker starts with a copy of the parent's metrics and profile.
+    metrics.reset()
+    profilers.reset()
+    generated = report_worker()
+    return generated, metrics.collect(), profilers.collect()
+
+
+def report_worker() -> int:
+    """
+    Claim and write batches of reports until there are none left. With
+    `REPORT_PIPELINE_DEPTH`, a writer thread writes one batch's files while
+    the next batches are claimed and queried; the bounded queue between them
+    stops the queries from running more than that many batches ahead.
+    """
+    # A forked worker must not share the parent's pooled connections.
+    engine().dispose(close=False)
+
+    if not REPORT_PIPELINE_DEPTH:
+        generated = 0
+        while batch := query_report_batch():
+            generated += write_report_batch(batch)
+        return generated
+
+    batches = queue.Queue(maxsize=REPORT_PIPELINE_DEPTH)
+    written = []
+    errors = []
+
+    def writer():
+        while (batch := batches.get()) is not None:
+            if errors:
+                release_reports(batch.session, batch.claim)
+                batch.session.close()
+                continue
+            try:
+                written.append(write_report_batch(batch))
+            except Exception as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=writer, name="report-writer")
+    thread.start()
+    try:
+        while not errors and (batch := query_report_batch()):
+            batches.put(batch)
+    finally:
+        batches.put(None)
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return sum(written)
+
+
+def claim_reports(session: Session) -> reports.Claim:
+    """
+    Claim a batch of jobs and commit straight away, see `reports.claim`, then
+    start the REPEATABLE READ snapshot their reports are built from.
+    """
+    with stage("claim", kind="report") as labels:
+        claim = reports.claim(session, REPORT_BATCH_SIZE, REPORT_CLAIM_TIMEOUT_SECONDS)
+        session.commit()
+        labels["rows"] = len(claim.purchase_order_ids)
+    session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    return claim
+
+
+def release_reports(session: Session, claim: reports.Claim):
+    """
+    Roll back a batch that failed and put its jobs back on the queue. Should
+    that fail too, they're claimed again once their claim times out.
+    """
+    session.rollback()
+    try:
+        reports.release(session, claim)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logging.error(e)
+
+
+class ReportBatch(NamedTuple):
+    # Holds the batch's transaction: the snapshot the data was read from,
+    # until the reports are written and it's committed.
+    session: Session
+    claim: reports.Claim
+    # Only for the reports that aren't in the cache.
+    data: Dict[str, reports.ReportData]
+    timestamp: str
+    # Cache keys of the reports that can be cached, see `report_cache_keys`.
+    cache_keys: Dict[str, str]
+
+
+def report_cache_keys(
+    session: Session, purchase_order_ids: List[str]
+) -> Dict[str, str]:
+    """
+    Full reports are cached by the purchase order's data version and the
+    output formats. Delta reports depend on the previous report too, so
+    they're never cached.
+    """
+    if not REPORT_CACHE_BYTES or REPORT_DELTA:
+        return {}
+
+    with stage(
+        "versions",
+        purchase_order=batch_label(purchase_order_ids),
+        kind="report",
+        rows=len(purchase_order_ids),
+    ):
+        versions = reports.data_versions(session, purchase_order_ids)
+    return {
+        purchase_order_id: caches.key(
+            purchase_order_id, version, sorted(REPORT_FORMATS)
+        )
+        for purchase_order_id, version in versions.items()
+    }
+
+
+def query_report_data(
+    session: Session, purchase_order_ids: List[str]
+) -> Dict[str, reports.ReportData]:
+    if not purchase_order_ids:
+        return {}
+    with stage(
+        "query",
+        purchase_order=batch_label(purchase_order_ids),
+        kind="report",
+        rows=len(purchase_order_ids),
+    ):
+        return reports.report_data(
+            session,
+            purchase_order_ids,
+            REPORT_DELTA,
+            REPORT_STREAMING_CHUNK_ROWS or None,
+        )
+
+
+def query_report_batch() -> Optional[ReportBatch]:
+    """
+    Claim up to `REPORT_BATCH_SIZE` jobs and fetch the data for the whole
+    batch at once, skipping reports that are already cached. Returns None
+    once there are no jobs left to claim.
+    """
+    session = Session(engine())
+    try:
+        claim = claim_reports(session)
+    except Exception:
+        session.close()
+        raise
+    if not claim.purchase_order_ids:
+        session.close()
+        return None
+
+    purchase_order_ids = claim.purchase_order_ids
+    try:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        cache_keys = report_cache_keys(session, purchase_order_ids)
+        cached = {
+            purchase_order_id
+            for purchase_order_id, cache_key in cache_keys.items()
+            if caches.has_report(REPORT_CACHE_DIR, cache_key)
+        }
+        data = query_report_data(
+            session,
+            [
+                purchase_order_id
+                for purchase_order_id in purchase_order_ids
+                if purchase_order_id not in cached
+            ],
+        )
+    except Exception:
+        release_reports(session, claim)
+        session.close()
+        raise
+
+    return ReportBatch(session, claim, data, timestamp, cache_keys)
+
+
+def write_reports(session: Session, batch: ReportBatch):
+    """
+    Write the batch's reports, record them and commit.
+
+    Cached reports are hard linked rather than written, and aren't recorded
+    again: the report that was cached already covers the same invoices.
+    """
+    generated = []
+    for purchase_order_id in batch.claim.purchase_order_ids:
+        cache_key = batch.cache_keys.get(purchase_order_id)
+        path = OUTPUT_DIR / "reports" / f"report_{purchase_order_id}_{batch.timestamp}"
+
+        if purchase_order_id not in batch.data:
+            with metrics.timer("link", kind="report") as labels:
+                linked = caches.link_report(REPORT_CACHE_DIR, cache_key, path)
+                labels["outcome"] = "ok" if linked is not None else "evicted"
+            if linked is not None:
+                logging.info(
+                    f"Report for {purchase_order_id} is unchanged, linked from cache"
+                )
+                continue
+            # Evicted since the batch was queried; the transaction still
+            # has the same snapshot, so query it now.
+            batch.data.update(query_report_data(session, [purchase_order_id]))
+
+        data = batch.data[purchase_order_id]
+        if data.previous_report_id is not None:
+            path = path.parent / f"{path.name}_delta"
+        outputs = []
+        for format in REPORT_FORMATS:
+            # Streamed invoice lines are read from the database here.
+            with stage("write", purchase_order=purchase_order_id, kind=format):
+                outputs.append(sinks.write(format, path, data))
+        if cache_key is not None:
+            caches.store_report(REPORT_CACHE_DIR, cache_key, path, outputs)
+        generated.append(purchase_order_id)
+
+    if generated:
+        with profilers.scope(stage="record", purchase_order=batch_label(generated)):
+            reports.create_report_db_records(session, generated)
+
+    with stage("commit", kind="report", rows=len(batch.claim.purchase_order_ids)):
+        session.commit()
+
+
+def write_report_batch(batch: ReportBatch) -> int:
+    """
+    Write the batch's reports (see `write_reports`), then finish their jobs.
+    Should writing fail, the jobs are put back on the queue. Returns the
+    number of reports written.
+    """
+    with batch.session as session:
+        try:
+            write_reports(session, batch)
+        except Exception:
+            release_reports(session, batch.claim)
+            raise
+
+        # In a transaction of its own: in the REPEATABLE READ one, deleting a
+        # job that was queued again since would fail to serialize.
+        reports.finish(session, batch.claim)
+        session.commit()
+
+    if batch.cache_keys:
+        caches.evict(REPORT_CACHE_DIR, REPORT_CACHE_BYTES)
+
+    return len(batch.claim.purchase_order_ids)
+
+
+################################################################################
+# Verification
+################################################################################
+def verify_invoiced_items() -> bool:
+    """
+    Rebuild the `invoiced_item` totals from the invoice lines, logging any
+    rows that had drifted. Returns whether the stored totals were correct.
+    """
+    with Session(engine()) as session:
+        differences = ingestors.rebuild_invoiced_items(session)
+        session.commit()
+
+    if differences.empty:
+        logging.info("invoiced_item matches the invoice lines")
+        return True
+
+    logging.error(
+        f"invoiced_item differed from the invoice lines in {len(differences)} "
+        f"rows and has been rebuilt:\n{differences.to_string(index=False)}"
+    )
+    return False
+
+
+################################################################################
+# Commands
+################################################################################
+def ingest_and_report():
+    ingest_input_files()
+    generate_reports()
+    export_metrics()
+
+
+def validate_files(input_files: List[Path]) -> bool:
+    """
+    Parse and validate files without ingesting them, logging what would
+    happen to each. Only the files themselves are checked: an invoice for a
+    purchase order that isn't in the database still passes. Returns whether
+    every file is valid.
+    """
+    files = named_input_files(input_files)
+    valid = len(files) == len(input_files)
+    for parsed in parsers.parse_files(
+        files,
+        PARSE_WORKERS,
+        backend=READER_BACKEND,
+        streaming_threshold=STREAMING_THRESHOLD_BYTES,
+    ):
+        if parsed.kind is None:
+            log_rejection(parsed.file, parsed.event, parsed.validation)
+            valid = False
+            continue
+
+        if parsed.df is None:
+            try:
+                for _ in parsers.stream_file(
+                    parsed.file, parsed.kind, STREAMING_CHUNK_ROWS, READER_BACKEND
+                ):
+                    pass
+            except parsers.RejectedFile as e:
+                log_rejection(parsed.file, e.event, e.validation)
+                valid = False
+                continue
+            except Exception as e:
+                log_excel_file_event("Failed Validation", parsed.file)
+                logging.error(e)
+                valid = False
+                continue
+
+        log_excel_file_event(f"Valid {parsed.kind}", parsed.file)
+    return valid
+
+
+def watch():
+    """
+    Keep running, ingesting files as they land in the input directory and
+    reporting on them straight away. The engine, its connection pool and the
+    parser and report processes stay warm between drops.
+    """
+    logging.info(f"Watching {INPUT_DIR}")
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+        logging.info(f"Serving metrics at http://localhost:{METRICS_PORT}/metrics")
+    with (
+        ProcessPoolExecutor(max_workers=PARSE_WORKERS) as parse_executor,
+        ProcessPoolExecutor(max_workers=REPORT_WORKERS) as report_executor,
+    ):
+        for _ in watchers.watch(INPUT_DIR, WATCH_POLL_SECONDS):
+            try:
+                ingest_input_files(parse_executor)
+                generate_reports(report_executor)
+            except Exception as e:
+                # e.g. the database is briefly unavailable; files are only moved
+                # once their batch is committed, so those that weren't ingested
+                # are still in the input directory for the next drop.
+                logging.exception(e)
+            export_metrics()
@@ -0,0 +1,32 @@
+from .config import (
+    APP_DIR,
+    FILES_DIR,
+    INPUT_DIR,
+    OUTPUT_DIR,
+    REPORT_CACHE_DIR,
+    PARSE_CACHE_DIR,
+    PARSE_WORKERS,
+    READER_BACKEND,
+    STREAMING_THRESHOLD_BYTES,
+    STREAMING_CHUNK_ROWS,
+    PARSE_CACHE_BYTES,
+    INGEST_BULK,
+    INGEST_BATCH_FILES,
+    INGEST_BATCH_ROWS,
+    INGEST_BATCH_BYTES,
+    INGEST_ASYNC,
+    INGEST_CONCURRENCY,
+    REPORT_WORKERS,
+    REPORT_BATCH_SIZE,
+    REPORT_CLAIM_TIMEOUT_SECONDS,
+    REPORT_DELTA,
+    REPORT_FORMATS,
+    REPORT_CACHE_BYTES,
+    REPORT_PIPELINE_DEPTH,
+    REPORT_STREAMING_CHUNK_ROWS,
+    METRICS_FILE,
+    METRICS_PORT,
+    SQL_PROFILE,
+    SQL_PROFILE_SLOW_SECONDS,
+    WATCH_POLL_SECONDS,
+)
@@ -0,0 +1,72 @@
+from os import cpu_count, environ
+from pathlib import Path
+
+# Settings are read from the environment when this module is first imported,
+# so `main` loads `.env` before importing it.
+APP_DIR = Path(__file__).resolve().parent.parent.parent
+# Holds the input, output and cache directories.
+FILES_DIR = Path(environ.get("FILES_DIR", APP_DIR / "files"))
+INPUT_DIR = FILES_DIR / "input"
+OUTPUT_DIR = FILES_DIR / "output"
+REPORT_CACHE_DIR = FILES_DIR / "cache" / "reports"
+PARSE_CACHE_DIR = FILES_DIR / "cache" / "parsed"
+
+# Number of processes used to parse workbooks; defaults to one per core.
+PARSE_WORKERS = int(environ.get("PARSE_WORKERS", 0)) or None
+# Engine used to read workbooks, see `readers.READERS`.
+READER_BACKEND = environ.get("READER_BACKEND", "openpyxl")
+# Files larger than this are streamed in chunks instead of loaded in one go.
+STREAMING_THRESHOLD_BYTES = int(environ.get("STREAMING_THRESHOLD_BYTES", 20_000_000))
+STREAMING_CHUNK_ROWS = int(environ.get("STREAMING_CHUNK_ROWS", 10_000))
+# Parsed files that fail to ingest are cached (as Feather, needs pyarrow) so
+# retrying them doesn't read the workbook again. Least recently used frames are
+# evicted once it's larger than this; 0 turns the cache off.
+PARSE_CACHE_BYTES = int(environ.get("PARSE_CACHE_BYTES", 0))
+# "copy" loads line items with PostgreSQL COPY, "orm" with one INSERT per row.
+INGEST_BULK = environ.get("INGEST_METHOD", "copy") == "copy"
+# Files are committed in batches; a batch is committed as soon as it reaches
+# any of these budgets.
+INGEST_BATCH_FILES = int(environ.get("INGEST_BATCH_FILES", 100))
+INGEST_BATCH_ROWS = int(environ.get("INGEST_BATCH_ROWS", 100_000))
+INGEST_BATCH_BYTES = int(environ.get("INGEST_BATCH_BYTES", 50_000_000))
+# "async" ingests with asyncio instead: each file is written in its own
+# transaction, up to INGEST_CONCURRENCY at once, while the next ones are parsed.
+INGEST_ASYNC = environ.get("INGEST_PIPELINE", "sync") == "async"
+INGEST_CONCURRENCY = int(environ.get("INGEST_CONCURRENCY", 4))
+# Number of processes generating reports; defaults to one per core.
+REPORT_WORKERS = int(environ.get("REPORT_WORKERS", 0)) or cpu_count()
+# Number of purchase orders a report worker claims and queries at once.
+REPORT_BATCH_SIZE = int(environ.get("REPORT_BATCH_SIZE", 50))
+# Jobs whose worker hasn't finished them this long after claiming them (e.g.
+# it died) are claimed again by another worker.
+REPORT_CLAIM_TIMEOUT_SECONDS = float(environ.get("REPORT_CLAIM_TIMEOUT_SECONDS", 600))
+# "delta" reports on purchase orders that already have a report only cover
+# the invoices added since; "full" always reports the whole history.
+REPORT_DELTA = environ.get("REPORT_MODE", "full") == "delta"
+# Comma separated output formats for reports, see `sinks.SINKS`.
+REPORT_FORMATS = environ.get("REPORT_FORMAT", "xlsx").split(",")
+# Reports whose data hasn't changed since they were last generated are hard
+# linked from this cache instead of being generated again. Least recently used
+# reports are evicted once it's larger than this; 0 turns the cache off.
+REPORT_CACHE_BYTES = int(environ.get("REPORT_CACHE_BYTES", 1_000_000_000))
+# Batches of reports a worker may query ahead of the one it's writing; 0
+# writes each batch before querying the next.
+REPORT_PIPELINE_DEPTH = int(environ.get("REPORT_PIPELINE_DEPTH", 2))
+# Read each report's raw invoice lines from a server-side cursor this many
+# rows at a time instead of all at once; 0 turns streaming off.
+REPORT_STREAMING_CHUNK_ROWS = int(environ.get("REPORT_STREAMING_CHUNK_ROWS", 0))
+# Stage timings are written here in the Prometheus text format after every
+# run, e.g. for node_exporter's textfile collector; unset turns it off.
+METRICS_FILE = Path(environ["METRICS_FILE"]) if environ.get("METRICS_FILE") else None
+# `watch` also serves them at http://localhost:METRICS_PORT/metrics; 0 turns
+# it off.
+METRICS_PORT = int(environ.get("METRICS_PORT", 0))
+# Opt-in: time every SQL statement and count the rows it returned or
+# affected, by stage, file and purchase order, and log a summary after each
+# run.
+SQL_PROFILE = environ.get("SQL_PROFILE", "0") == "1"
+# Profiled statements slower than this are logged with their
+# EXPLAIN (ANALYZE, BUFFERS) plan; 0 turns it off.
+SQL_PROFILE_SLOW_SECONDS = float(environ.get("SQL_PROFILE_SLOW_SECONDS", 0.5))
+# Used by `--watch` where inotify isn't available.
+WATCH_POLL_SECONDS = float(environ.get("WATCH_POLL_SECONDS", 2))
@@ -0,0 +1 @@
+from .generators import Drop, generate_drop
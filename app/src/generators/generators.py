@@ -0,0 +1,171 @@
+from identifiers import INVOICE_COLUMNS, PURCHASE_ORDER_COLUMNS
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import List, NamedTuple
+
+# Item codes are drawn from a catalog this many times larger than a purchase
+# order, so orders share some items but not all.
+CATALOG_SCALE = 10
+
+
+################################################################################
+# Return Types
+################################################################################
+class Drop(NamedTuple):
+    purchase_orders: List[Path]
+    invoices: List[Path]
+    # Files written with an error that fails validation.
+    invalid: List[Path]
+    # Data rows across every file.
+    rows: int
+
+
+################################################################################
+# Functions
+################################################################################
+def _amounts(cents: np.ndarray) -> np.ndarray:
+    return cents / 100
+
+
+def _purchase_order(rng: np.random.Generator, number: int, lines: int) -> pd.DataFrame:
+    items = rng.choice(lines * CATALOG_SCALE, size=lines, replace=False)
+    quantities = rng.integers(1, 100, size=lines, endpoint=True)
+    unit_prices = rng.integers(100, 100_000, size=lines, endpoint=True)
+    return pd.DataFrame(
+        {
+            "PO Number": f"PO-{number:06d}",
+            "PO Line": np.arange(1, lines + 1),
+            "Item Code": [f"ITEM-{item:06d}" for item in items],
+            "Description": [f"Item {item}" for item in items],
+            "Ordered Qty": quantities,
+            "Unit Price": unit_prices,
+            "Total Amount": quantities * unit_prices,
+        },
+        columns=PURCHASE_ORDER_COLUMNS,
+    )
+
+
+def _invoices(
+    rng: np.random.Generator,
+    purchase_order: pd.DataFrame,
+    count: int,
+    mismatch_rate: float,
+) -> List[pd.DataFrame]:
+    """
+    Split each line's ordered quantity across `count` invoices. A
+    `mismatch_rate` share of the invoice lines then disagree with the purchase
+    order: a different unit price, more than was ordered, or an item that
+    isn't on it.
+    """
+    if count == 0:
+        return []
+
+    purchase_order_id = purchase_order["PO Number"].iat[0]
+    ordered = purchase_order["Ordered Qty"].to_numpy()
+    # Random cut points give each invoice a share of every line.
+    cuts = np.sort(
+        rng.integers(0, ordered[:, None] + 1, size=(len(ordered), count - 1))
+    )
+    bounds = np.hstack([np.zeros((len(ordered), 1), int), cuts, ordered[:, None]])
+    shares = np.diff(bounds, axis=1)
+
+    invoices = []
+    for i in range(count):
+        quantities = shares[:, i]
+        lines = purchase_order[quantities > 0]
+        quantities = quantities[quantities > 0]
+        items = lines["Item Code"].to_numpy(dtype=object).copy()
+        descriptions = lines["Description"].to_numpy(dtype=object).copy()
+        unit_prices = lines["Unit Price"].to_numpy().copy()
+
+        mismatched = rng.random(len(lines)) < mismatch_rate
+        kinds = rng.integers(0, 3, size=len(lines))
+        price = mismatched & (kinds == 0)
+        unit_prices[price] += rng.integers(1, 500, size=price.sum())
+        over = mismatched & (kinds == 1)
+        quantities = quantities + np.where(over, rng.integers(1, 5, size=len(lines)), 0)
+        unknown = mismatched & (kinds == 2)
+        for row in np.flatnonzero(unknown):
+            items[row] = f"EXTRA-{purchase_order_id}-{i}-{row}"
+            descriptions[row] = f"Extra item {row}"
+
+        invoices.append(
+            pd.DataFrame(
+                {
+                    "Invoice Number": f"INV-{purchase_order_id[3:]}-{i + 1}",
+                    "PO Number": purchase_order_id,
+                    "Item Code": items,
+                    "Description": descriptions,
+                    "Invoiced Qty": quantities,
+                    "Unit Price": unit_prices,
+                    "Total Amount": quantities * unit_prices,
+                },
+                columns=INVOICE_COLUMNS,
+            )
+        )
+    return invoices
+
+
+def _break(rng: np.random.Generator, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row's total no longer matches its quantity and unit price.
+    """
+    df = df.copy()
+    row = rng.integers(len(df))
+    df.loc[df.index[row], "Total Amount"] += 1
+    return df
+
+
+def _write(df: pd.DataFrame, file: Path):
+    df = df.copy()
+    for column in ["Unit Price", "Total Amount"]:
+        df[column] = _amounts(df[column].to_numpy())
+    df.to_excel(file, index=False, engine="xlsxwriter")
+
+
+def generate_drop(
+    directory: Path,
+    purchase_orders: int = 10,
+    lines_per_order: int = 20,
+    invoices_per_order: int = 2,
+    mismatch_rate: float = 0.05,
+    error_rate: float = 0.0,
+    seed: int = 0,
+) -> Drop:
+    """
+    Write a drop of purchase orders and their invoices to `directory`, named
+    like real input files. The same arguments always write the same drop.
+
+    An `error_rate` share of the files have a row whose total is wrong, so
+    they fail validation; invoices of a broken purchase order then fail to
+    ingest as well.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    drop = Drop([], [], [], 0)
+    rows = 0
+
+    for number in range(1, purchase_orders + 1):
+        purchase_order = _purchase_order(rng, number, lines_per_order)
+        files = [(directory / f"PurchaseOrder_{number}.xlsx", purchase_order)]
+        files += [
+            (directory / f"Invoice_{number}_{i + 1}.xlsx", invoice)
+            for i, invoice in enumerate(
+                _invoices(rng, purchase_order, invoices_per_order, mismatch_rate)
+            )
+        ]
+
+        for file, df in files:
+            if df.empty:
+                # Every line went to the other invoices.
+                continue
+            if rng.random() < error_rate:
+                df = _break(rng, df)
+                drop.invalid.append(file)
+            _write(df, file)
+            rows += len(df)
+        drop.purchase_orders.append(files[0][0])
+        drop.invoices.extend(file for file, df in files[1:] if not df.empty)
+
+    return drop._replace(rows=rows)
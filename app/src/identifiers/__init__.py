@@ -1 +1,10 @@
-from .identifiers import by_columns
+from .identifiers import (
+    by_columns,
+    by_header,
+    read_first_row,
+    read_header,
+    INVOICE,
+    INVOICE_COLUMNS,
+    PURCHASE_ORDER,
+    PURCHASE_ORDER_COLUMNS,
+)
@@ -1,5 +1,29 @@
+from openpyxl import load_workbook
 from pandas import DataFrame
-from typing import List
+from pathlib import Path
+from typing import List, Optional
+
+PURCHASE_ORDER = "Purchase Order"
+INVOICE = "Invoice"
+
+PURCHASE_ORDER_COLUMNS = [
+    "PO Number",
+    "PO Line",
+    "Item Code",
+    "Description",
+    "Ordered Qty",
+    "Unit Price",
+    "Total Amount",
+]
+INVOICE_COLUMNS = [
+    "Invoice Number",
+    "PO Number",
+    "Item Code",
+    "Description",
+    "Invoiced Qty",
+    "Unit Price",
+    "Total Amount",
+]
 
 
 def by_columns(df: DataFrame, expected: List[str]) -> bool:
@@ -13,3 +37,55 @@ def by_columns(df: DataFrame, expected: List[str]) -> bool:
             return False
 
     return True
+
+
+def read_header(file: Path) -> List[str]:
+    """
+    Read only the header row of the first sheet.
+
+    The workbook is opened in read-only mode, so rows are never loaded beyond
+    the first one regardless of sheet size.
+    """
+    workbook = load_workbook(file, read_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+    finally:
+        workbook.close()
+
+    header = list(header)
+    # Read-only sheets may report a wider dimension than the data actually has.
+    while header and header[-1] is None:
+        header.pop()
+    return header
+
+
+def read_first_row(file: Path) -> List:
+    """
+    Read only the first data row of the first sheet, like `read_header`.
+    """
+    workbook = load_workbook(file, read_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        return list(next(sheet.iter_rows(min_row=2, max_row=2, values_only=True), ()))
+    finally:
+        workbook.close()
+
+
+def by_header(file: Path) -> Optional[str]:
+    """
+    Classify a workbook as PURCHASE_ORDER or INVOICE from its header row alone.
+    Returns None for anything else, including files that aren't workbooks or
+    are broken ones: a zip without a workbook in it, a workbook without sheets,
+    ... raise all sorts of errors from openpyxl.
+    """
+    try:
+        header = read_header(file)
+    except Exception:
+        return None
+
+    if header == PURCHASE_ORDER_COLUMNS:
+        return PURCHASE_ORDER
+    if header == INVOICE_COLUMNS:
+        return INVOICE
+    return None
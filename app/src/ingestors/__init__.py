@@ -1,3 +1,8 @@
-from .files import file
-from .invoice import invoice
-from .purchase_order import purchase_order
+from .files import FileHash, duplicate, file, file_hash, ingested_files, record_file
+from .invoice import invoice, invoice_line_items, invoice_stream
+from .invoiced_items import add_invoiced_items, rebuild_invoiced_items
+from .purchase_order import (
+    purchase_order,
+    purchase_order_line_items,
+    purchase_order_stream,
+)
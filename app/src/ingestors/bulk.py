@@ -0,0 +1,54 @@
+import pandas as pd
+import psycopg
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from typing import Iterator
+
+# Rows written per COPY buffer; keeps the CSV text for huge frames bounded.
+COPY_CHUNK_ROWS = 50_000
+
+
+def copy_rows(session: Session, table: str, df: pd.DataFrame):
+    """
+    Stream the rows of `df` into `table` with PostgreSQL COPY. Column names of
+    `df` must match the table's.
+
+    COPY runs on the session's own connection, so the rows land in the same
+    transaction as everything else the session has done and are subject to
+    the same constraints. Driver errors are re-raised as the matching
+    SQLAlchemy exception (e.g. IntegrityError), same as an ORM flush.
+    """
+    # Parent rows (purchase_order / invoice) must exist before the COPY.
+    session.flush()
+
+    statement = f"COPY {table} ({', '.join(df.columns)}) FROM STDIN (FORMAT csv)"
+    connection = session.connection().connection
+    try:
+        if isinstance(connection.driver_connection, psycopg.AsyncConnection):
+            # An AsyncSession's `run_sync`, see `commands.ingest_files_async`.
+            connection.dbapi_connection.run_async(
+                lambda driver_connection: _copy_async(driver_connection, statement, df)
+            )
+            return
+
+        with connection.driver_connection.cursor() as cursor:
+            with cursor.copy(statement) as copy:
+                for buffer in _csv_buffers(df):
+                    copy.write(buffer)
+    except psycopg.Error as e:
+        raise DBAPIError.instance(statement, None, e, psycopg.Error) from e
+
+
+def _csv_buffers(df: pd.DataFrame) -> Iterator[str]:
+    for start in range(0, len(df), COPY_CHUNK_ROWS):
+        chunk = df.iloc[start : start + COPY_CHUNK_ROWS]
+        yield chunk.to_csv(index=False, header=False)
+
+
+async def _copy_async(
+    driver_connection: psycopg.AsyncConnection, statement: str, df: pd.DataFrame
+):
+    async with driver_connection.cursor() as cursor:
+        async with cursor.copy(statement) as copy:
+            for buffer in _csv_buffers(df):
+                await copy.write(buffer)
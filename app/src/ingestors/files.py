@@ -1,5 +1,63 @@
+import hashlib
+from models import IngestedFile
 from pathlib import Path
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, NamedTuple
 
 
-def file(out_dir: Path, file: Path):
-    file.rename(out_dir / "ingested" / file.name)
+class FileHash(NamedTuple):
+    sha256: str
+    size: int
+
+
+def file(out_dir: Path, file: Path) -> Path:
+    destination = out_dir / "ingested" / file.name
+    file.rename(destination)
+    return destination
+
+
+def duplicate(out_dir: Path, file: Path) -> Path:
+    destination = out_dir / "duplicates" / file.name
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    file.rename(destination)
+    return destination
+
+
+def file_hash(file: Path) -> FileHash:
+    """
+    SHA-256 of the file's contents, read in blocks rather than all at once.
+    """
+    with file.open("rb") as f:
+        digest = hashlib.file_digest(f, "sha256")
+        return FileHash(digest.hexdigest(), f.tell())
+
+
+def ingested_files(session: Session, hashes: Iterable[str]) -> Dict[str, IngestedFile]:
+    """
+    The files already recorded with any of `hashes`, by hash.
+    """
+    hashes = list(hashes)
+    if not hashes:
+        return {}
+    return {
+        ingested.sha256: ingested
+        for ingested in session.scalars(
+            select(IngestedFile).where(IngestedFile.sha256.in_(hashes))
+        )
+    }
+
+
+def record_file(session: Session, hash: FileHash, file: Path, outcome: str):
+    """
+    Record what became of `file` in the caller's transaction. A file recorded
+    concurrently by another run keeps its first outcome.
+    """
+    session.execute(
+        insert(IngestedFile)
+        .values(
+            sha256=hash.sha256, size=hash.size, file_name=file.name, outcome=outcome
+        )
+        .on_conflict_do_nothing(index_elements=["sha256"])
+    )
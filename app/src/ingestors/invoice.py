@@ -1,11 +1,16 @@
+from .bulk import copy_rows
+from .invoiced_items import add_invoiced_items
+import money
 from models import Invoice, InvoiceLineItem, PurchaseOrder
 from pandas import DataFrame
 from sqlalchemy.orm import Session
+from typing import Iterable
 
 
 def invoice(
     session: Session,
     df: DataFrame,
+    bulk: bool = False,
 ) -> str:
     purchase_order_id = df["PO Number"].iat[0]
     purchase_order = session.get(PurchaseOrder, purchase_order_id)
@@ -18,18 +23,81 @@ def invoice(
     )
     session.add(invoice)
 
+    invoice_line_items(session, invoice.id, df, bulk)
+
+    return purchase_order_id
+
+
+def invoice_line_items(
+    session: Session,
+    invoice_id: str,
+    df: DataFrame,
+    bulk: bool = False,
+):
+    """
+    Amounts in `df` are cents, see `money.parse_amounts`.
+
+    With `bulk`, lines are loaded with COPY instead of one ORM object (and one
+    INSERT) per row. Either way the lines are added to the purchase order's
+    `invoiced_item` totals.
+    """
+    add_invoiced_items(session, df["PO Number"].iat[0], df)
+
+    if bulk:
+        copy_rows(
+            session,
+            InvoiceLineItem.__tablename__,
+            DataFrame(
+                {
+                    "invoice_id": invoice_id,
+                    "item_code": df["Item Code"],
+                    "description": df["Description"],
+                    "quantity": df["Invoiced Qty"].astype("int64"),
+                    "unit_price": money.to_text(df["Unit Price"]),
+                    "total_price": money.to_text(df["Total Amount"]),
+                }
+            ),
+        )
+        return
+
     session.add_all(
         [
             InvoiceLineItem(
-                invoice_id=invoice.id,
+                invoice_id=invoice_id,
                 item_code=row["Item Code"],
                 description=row["Description"],
                 quantity=row["Invoiced Qty"],
-                unit_price=row["Unit Price"],
-                total_price=row["Total Amount"],
+                unit_price=money.to_decimal(row["Unit Price"]),
+                total_price=money.to_decimal(row["Total Amount"]),
             )
             for _, row in df.iterrows()
         ]
     )
 
+
+def invoice_stream(
+    session: Session,
+    chunks: Iterable[DataFrame],
+    bulk: bool = False,
+) -> str:
+    """
+    Ingest an invoice one chunk at a time. Each chunk is flushed and expunged
+    before the next one is read, so memory is bounded by the chunk size
+    instead of the sheet size.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        raise Exception("No data")
+
+    purchase_order_id = invoice(session, first, bulk)
+    invoice_id = first["Invoice Number"].iat[0]
+    for chunk in chunks:
+        session.flush()
+        session.expunge_all()
+        invoice_line_items(session, invoice_id, chunk, bulk)
+
+    session.flush()
+    session.expunge_all()
+
     return purchase_order_id
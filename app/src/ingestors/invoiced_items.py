@@ -0,0 +1,144 @@
+import money
+from models import Invoice, InvoiceLineItem, InvoicedItem
+import pandas as pd
+from sqlalchemy import (
+    BigInteger,
+    Numeric,
+    Text,
+    and_,
+    bindparam,
+    delete,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.orm import Session
+
+KEY_COLUMNS = ["purchase_order_id", "item_code", "description"]
+
+
+def add_invoiced_items(session: Session, purchase_order_id: str, df: pd.DataFrame):
+    """
+    Add the invoice lines in `df` (amounts in cents) to the purchase order's
+    running totals in `invoiced_item`.
+
+    Runs in the caller's transaction, so the totals always match the invoice
+    lines that are committed with them.
+    """
+    totals = (
+        df.groupby(["Item Code", "Description"], sort=False)
+        .agg(quantity=("Invoiced Qty", "sum"), total_price=("Total Amount", "sum"))
+        .reset_index()
+    )
+    if totals.empty:
+        return
+
+    # The totals go in as one array per column and are unnested server side:
+    # a single round trip, and the same statement whatever the row count.
+    rows = (
+        func.unnest(
+            bindparam("item_codes", type_=ARRAY(Text)),
+            bindparam("descriptions", type_=ARRAY(Text)),
+            bindparam("quantities", type_=ARRAY(BigInteger)),
+            bindparam("total_prices", type_=ARRAY(Numeric(14, 2))),
+        )
+        .table_valued("item_code", "description", "quantity", "total_price")
+        .render_derived()
+    )
+    statement = insert(InvoicedItem.__table__).from_select(
+        [*KEY_COLUMNS, "quantity", "total_price"],
+        select(
+            bindparam("purchase_order_id", type_=Text),
+            rows.c.item_code,
+            rows.c.description,
+            rows.c.quantity,
+            rows.c.total_price,
+        ),
+    )
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=KEY_COLUMNS,
+            set_={
+                "quantity": InvoicedItem.quantity + statement.excluded.quantity,
+                "total_price": InvoicedItem.total_price
+                + statement.excluded.total_price,
+            },
+        ),
+        {
+            "purchase_order_id": purchase_order_id,
+            "item_codes": totals["Item Code"].tolist(),
+            "descriptions": totals["Description"].tolist(),
+            "quantities": [int(quantity) for quantity in totals["quantity"]],
+            "total_prices": [
+                money.to_decimal(cents) for cents in totals["total_price"]
+            ],
+        },
+    )
+
+
+def rebuild_invoiced_items(session: Session) -> pd.DataFrame:
+    """
+    Recompute `invoiced_item` from the invoice lines and replace its contents
+    with the result. Returns the rows where the stored totals differed from
+    the rebuilt ones (None on the side a row is missing from).
+
+    The table is locked against concurrent ingestion until the caller's
+    transaction ends.
+    """
+    session.execute(text("LOCK TABLE invoiced_item IN SHARE ROW EXCLUSIVE MODE"))
+
+    rebuilt = (
+        select(
+            Invoice.purchase_order_id,
+            InvoiceLineItem.item_code,
+            InvoiceLineItem.description,
+            func.sum(InvoiceLineItem.quantity).label("quantity"),
+            func.sum(InvoiceLineItem.total_price).label("total_price"),
+        )
+        .join(Invoice)
+        .group_by(
+            Invoice.purchase_order_id,
+            InvoiceLineItem.item_code,
+            InvoiceLineItem.description,
+        )
+        .subquery()
+    )
+    stored = InvoicedItem.__table__
+
+    differences = (
+        select(
+            *[
+                func.coalesce(stored.c[key], rebuilt.c[key]).label(key)
+                for key in KEY_COLUMNS
+            ],
+            stored.c.quantity.label("stored_quantity"),
+            rebuilt.c.quantity.label("rebuilt_quantity"),
+            stored.c.total_price.label("stored_total_price"),
+            rebuilt.c.total_price.label("rebuilt_total_price"),
+        )
+        .select_from(
+            stored.join(
+                rebuilt,
+                and_(*[stored.c[key] == rebuilt.c[key] for key in KEY_COLUMNS]),
+                full=True,
+            )
+        )
+        .where(
+            stored.c.quantity.is_distinct_from(rebuilt.c.quantity)
+            | stored.c.total_price.is_distinct_from(rebuilt.c.total_price)
+        )
+        .order_by(*KEY_COLUMNS)
+    )
+    result = session.execute(differences)
+    df = pd.DataFrame(result.all(), columns=list(result.keys()))
+
+    if not df.empty:
+        session.execute(delete(stored))
+        session.execute(
+            stored.insert().from_select(
+                [*KEY_COLUMNS, "quantity", "total_price"], select(rebuilt)
+            )
+        )
+
+    return df
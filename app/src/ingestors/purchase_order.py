@@ -1,28 +1,92 @@
+from .bulk import copy_rows
+import money
 from models import PurchaseOrder, PurchaseOrderLineItem
 from pandas import DataFrame
 from sqlalchemy.orm import Session
+from typing import Iterable
 
 
 def purchase_order(
     session: Session,
     df: DataFrame,
+    bulk: bool = False,
 ) -> str:
     purchase_order = PurchaseOrder(id=df["PO Number"].iat[0])
     session.add(purchase_order)
 
+    purchase_order_line_items(session, purchase_order.id, df, bulk)
+
+    return purchase_order.id
+
+
+def purchase_order_line_items(
+    session: Session,
+    purchase_order_id: str,
+    df: DataFrame,
+    bulk: bool = False,
+):
+    """
+    Amounts in `df` are cents, see `money.parse_amounts`.
+
+    With `bulk`, lines are loaded with COPY instead of one ORM object (and one
+    INSERT) per row.
+    """
+    if bulk:
+        copy_rows(
+            session,
+            PurchaseOrderLineItem.__tablename__,
+            DataFrame(
+                {
+                    "purchase_order_id": purchase_order_id,
+                    "purchase_order_line_number": df["PO Line"].astype("int64"),
+                    "item_code": df["Item Code"],
+                    "description": df["Description"],
+                    "quantity": df["Ordered Qty"].astype("int64"),
+                    "unit_price": money.to_text(df["Unit Price"]),
+                    "total_price": money.to_text(df["Total Amount"]),
+                }
+            ),
+        )
+        return
+
     session.add_all(
         [
             PurchaseOrderLineItem(
-                purchase_order_id=purchase_order.id,
+                purchase_order_id=purchase_order_id,
                 purchase_order_line_number=row["PO Line"],
                 item_code=row["Item Code"],
                 description=row["Description"],
                 quantity=row["Ordered Qty"],
-                unit_price=row["Unit Price"],
-                total_price=row["Total Amount"],
+                unit_price=money.to_decimal(row["Unit Price"]),
+                total_price=money.to_decimal(row["Total Amount"]),
             )
             for _, row in df.iterrows()
         ]
     )
 
-    return purchase_order.id
+
+def purchase_order_stream(
+    session: Session,
+    chunks: Iterable[DataFrame],
+    bulk: bool = False,
+) -> str:
+    """
+    Ingest a purchase order one chunk at a time. Each chunk is flushed and
+    expunged before the next one is read, so memory is bounded by the chunk
+    size instead of the sheet size.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        raise Exception("No data")
+
+    purchase_order_id = purchase_order(session, first, bulk)
+    for chunk in chunks:
+        session.flush()
+        session.expunge_all()
+        purchase_order_line_items(session, purchase_order_id, chunk, bulk)
+
+    session.flush()
+    session.expunge_all()
+
+    return purchase_order_id
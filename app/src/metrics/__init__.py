@@ -0,0 +1,19 @@
+from .metrics import (
+    BUCKETS,
+    STAGE_ROWS,
+    STAGE_SECONDS,
+    Histogram,
+    Snapshot,
+    collect,
+    increment,
+    label,
+    merge,
+    observe,
+    record,
+    render,
+    reset,
+    serve,
+    timed,
+    timer,
+    write_textfile,
+)
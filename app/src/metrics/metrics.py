@@ -0,0 +1,248 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import threading
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Durations and row counts of every stage a file or report goes through,
+# labelled by `stage`, `kind` (purchase order, invoice, report format, ...)
+# and `outcome`.
+STAGE_SECONDS = "pipeline_stage_duration_seconds"
+STAGE_ROWS = "pipeline_stage_rows_total"
+
+HELP = {
+    STAGE_SECONDS: ("histogram", "Time spent in each stage of the pipeline."),
+    STAGE_ROWS: (
+        "counter",
+        "Rows (purchase orders, for reports) that went through each stage.",
+    ),
+}
+
+# Upper bounds of the histogram buckets, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LABELS = ("stage", "kind", "outcome")
+
+# One series per metric name and label values, in `LABELS` order.
+Series = Tuple[str, Tuple[str, ...]]
+
+
+################################################################################
+# Return Types
+################################################################################
+class Histogram(NamedTuple):
+    # Observations in each of `BUCKETS`, plus one for anything larger.
+    buckets: List[int]
+    sum: float
+    count: int
+
+
+class Snapshot(NamedTuple):
+    """
+    Everything recorded in a process, plain enough to be pickled back from a
+    worker and merged into the parent's (see `merge`).
+    """
+
+    histograms: Dict[Series, Histogram]
+    counters: Dict[Series, float]
+
+
+################################################################################
+# Recording
+################################################################################
+_lock = threading.Lock()
+_histograms: Dict[Series, Histogram] = {}
+_counters: Dict[Series, float] = {}
+
+
+def _series(name: str, labels: Dict[str, str]) -> Series:
+    return name, tuple(str(labels.get(key, "")) for key in LABELS)
+
+
+def label(value: str) -> str:
+    """
+    "Failed Validation" -> "failed_validation", for use as a label value.
+    """
+    return value.lower().replace(" ", "_")
+
+
+def observe(name: str, value: float, **labels: str):
+    series = _series(name, labels)
+    with _lock:
+        histogram = _histograms.get(series) or Histogram(
+            [0] * (len(BUCKETS) + 1), 0.0, 0
+        )
+        histogram.buckets[bisect_left(BUCKETS, value)] += 1
+        _histograms[series] = histogram._replace(
+            sum=histogram.sum + value, count=histogram.count + 1
+        )
+
+
+def increment(name: str, value: float = 1, **labels: str):
+    series = _series(name, labels)
+    with _lock:
+        _counters[series] = _counters.get(series, 0) + value
+
+
+def record(stage: str, seconds: float, rows: int = 0, **labels: str):
+    """
+    One pass through a stage: its duration and, if any, how many rows it
+    handled.
+    """
+    observe(STAGE_SECONDS, seconds, stage=stage, **labels)
+    if rows:
+        increment(STAGE_ROWS, rows, stage=stage, **labels)
+
+
+@contextmanager
+def timer(stage: str, **labels: str) -> Iterator[Dict[str, str]]:
+    """
+    Record how long the block takes. It can set "outcome" and "rows" in the
+    yielded dict; the outcome defaults to "ok", or "error" if it raises.
+    """
+    labels = {"outcome": "ok", **labels}
+    start = time.perf_counter()
+    try:
+        yield labels
+    except BaseException:
+        labels["outcome"] = "error"
+        raise
+    finally:
+        record(stage, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    """
+    Add how long the block takes to `timings[stage]`, for code that can't
+    record it here, like parsers running in worker processes.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def collect() -> Snapshot:
+    with _lock:
+        return Snapshot(
+            {
+                series: histogram._replace(buckets=list(histogram.buckets))
+                for series, histogram in _histograms.items()
+            },
+            dict(_counters),
+        )
+
+
+def merge(snapshot: Snapshot):
+    with _lock:
+        for series, other in snapshot.histograms.items():
+            histogram = _histograms.get(series)
+            if histogram is None:
+                _histograms[series] = other._replace(buckets=list(other.buckets))
+                continue
+            _histograms[series] = Histogram(
+                [a + b for a, b in zip(histogram.buckets, other.buckets)],
+                histogram.sum + other.sum,
+                histogram.count + other.count,
+            )
+        for series, value in snapshot.counters.items():
+            _counters[series] = _counters.get(series, 0) + value
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+################################################################################
+# Export
+################################################################################
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{key}="{_escape(value)}"' for key, value in zip(LABELS, values) if value]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(snapshot: Optional[Snapshot] = None) -> str:
+    """
+    The Prometheus text exposition format, version 0.0.4.
+    """
+    snapshot = snapshot or collect()
+    lines = []
+    for name, (kind, help) in HELP.items():
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        if kind == "histogram":
+            for (series_name, values), histogram in sorted(snapshot.histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, observations in zip(
+                    [*map(_format_value, BUCKETS), "+Inf"], histogram.buckets
+                ):
+                    cumulative += observations
+                    labels = _format_labels(values, f'le="{bound}"')
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                labels = _format_labels(values)
+                lines.append(f"{name}_sum{labels} {_format_value(histogram.sum)}")
+                lines.append(f"{name}_count{labels} {histogram.count}")
+        else:
+            for (series_name, values), value in sorted(snapshot.counters.items()):
+                if series_name == name:
+                    lines.append(
+                        f"{name}{_format_labels(values)} {_format_value(value)}"
+                    )
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: Path):
+    """
+    Written to a temporary file first and renamed over `path`, so a collector
+    (e.g. node_exporter's textfile collector) never reads half a file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.tmp")
+    temporary.write_text(render())
+    temporary.replace(path)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes would otherwise flood the log.
+        pass
+
+
+def serve(port: int, host: str = "") -> ThreadingHTTPServer:
+    """
+    Serve `/metrics` from a daemon thread until the returned server is shut
+    down or the process exits.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    return server
@@ -0,0 +1,27 @@
+from .base import Base
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Text,
+    TIMESTAMP,
+    func,
+)
+
+
+class IngestedFile(Base):
+    """
+    An input file by content hash, and what became of it, see
+    `ingestors.files`.
+    """
+
+    __tablename__ = "ingested_file"
+
+    sha256 = Column(Text, primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    file_name = Column(Text, nullable=False)
+    # The kind of file that was ingested, or the event it was skipped with.
+    outcome = Column(Text, nullable=False)
+
+    created_at = Column(
+        TIMESTAMP, server_default=func.current_timestamp(), nullable=False
+    )
@@ -0,0 +1,28 @@
+from .base import Base
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Text,
+    Numeric,
+    ForeignKey,
+)
+
+
+class InvoicedItem(Base):
+    """
+    Running totals of the invoice lines for each purchase order item, see
+    `ingestors.invoiced_items`.
+    """
+
+    __tablename__ = "invoiced_item"
+
+    purchase_order_id = Column(
+        Text,
+        ForeignKey("purchase_order.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    item_code = Column(Text, primary_key=True)
+    description = Column(Text, primary_key=True)
+
+    quantity = Column(BigInteger, nullable=False)
+    total_price = Column(Numeric(14, 2), nullable=False)
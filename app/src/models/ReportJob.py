@@ -0,0 +1,24 @@
+from .base import Base
+from sqlalchemy import (
+    Column,
+    Text,
+    TIMESTAMP,
+    ForeignKey,
+    func,
+)
+
+
+class ReportJob(Base):
+    __tablename__ = "report_job"
+
+    purchase_order_id = Column(
+        Text,
+        ForeignKey("purchase_order.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    created_at = Column(
+        TIMESTAMP, server_default=func.current_timestamp(), nullable=False
+    )
+    # Set while a worker is generating the report, see `reports.claim`.
+    claimed_at = Column(TIMESTAMP)
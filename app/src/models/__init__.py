@@ -1,3 +1,6 @@
 from .Invoice import Invoice, InvoiceLineItem
 from .PurchaseOrder import PurchaseOrder, PurchaseOrderLineItem
 from .Report import Report, ReportInvoice
+from .ReportJob import ReportJob
+from .InvoicedItem import InvoicedItem
+from .IngestedFile import IngestedFile
@@ -0,0 +1,8 @@
+from .money import (
+    AMOUNT_COLUMNS,
+    parse_amounts,
+    to_amounts,
+    to_cents,
+    to_decimal,
+    to_text,
+)
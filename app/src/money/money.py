@@ -0,0 +1,68 @@
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+
+# Spreadsheet columns holding money. Once a workbook is parsed these hold
+# int64 cents (pandas' nullable Int64) rather than float64 amounts.
+AMOUNT_COLUMNS = ["Unit Price", "Total Amount"]
+
+# Largest float64 magnitude where every integer is exactly representable.
+_MAX_EXACT = 2**53
+
+
+def to_cents(values: pd.Series) -> pd.Series:
+    """
+    Convert amounts to int64 cents.
+
+    Values that aren't a whole number of cents, or aren't numbers at all,
+    become <NA> so validation can report them.
+    """
+    amounts = pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64")
+    cents = np.round(amounts * 100)
+    exact = (
+        np.isfinite(amounts)
+        & (np.round(amounts, 2) == amounts)
+        & (np.abs(cents) < _MAX_EXACT)
+    )
+    return pd.Series(
+        pd.arrays.IntegerArray(np.where(exact, cents, 0).astype("int64"), ~exact),
+        index=values.index,
+        name=values.name,
+    )
+
+
+def parse_amounts(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert every money column of a freshly read sheet to int64 cents.
+    """
+    df = df.copy(deep=False)
+    for column in AMOUNT_COLUMNS:
+        if column in df.columns:
+            df[column] = to_cents(df[column])
+    return df
+
+
+def to_amounts(cents: pd.Series) -> pd.Series:
+    """
+    Cents back to float64 amounts, for display only.
+    """
+    return cents.astype("Float64") / 100
+
+
+def to_text(cents: pd.Series) -> pd.Series:
+    """
+    Format cents as exact decimal strings (e.g. -1205 -> "-12.05"), which
+    PostgreSQL reads straight into NUMERIC columns.
+    """
+    absolute = cents.abs()
+    sign = np.where(cents < 0, "-", "")
+    return (
+        sign
+        + (absolute // 100).astype(str)
+        + "."
+        + (absolute % 100).astype(str).str.zfill(2)
+    )
+
+
+def to_decimal(cents: int) -> Decimal:
+    return Decimal(int(cents)).scaleb(-2)
@@ -0,0 +1,10 @@
+from .parsers import (
+    FAILED_TO_PARSE,
+    INVOICE,
+    PURCHASE_ORDER,
+    ParsedFile,
+    RejectedFile,
+    parse_file,
+    parse_files,
+    stream_file,
+)
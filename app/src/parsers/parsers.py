@@ -0,0 +1,226 @@
+import caches
+import identifiers
+import metrics
+import money
+import readers
+import validators
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+import logging
+from os import cpu_count
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional
+
+from identifiers import INVOICE, PURCHASE_ORDER
+
+# Event of a file whose parsing raised, e.g. its worker process died. Unlike
+# the other events it may not happen again, so the file isn't rejected.
+FAILED_TO_PARSE = "Failed to Parse"
+
+
+################################################################################
+# Return Types
+################################################################################
+class ParsedFile(NamedTuple):
+    file: Path
+    # PURCHASE_ORDER, INVOICE, or None if the file should be skipped.
+    kind: Optional[str]
+    # None when the file is skipped, or is large enough to be streamed with
+    # `stream_file` instead.
+    df: Optional[pd.DataFrame]
+    # Excel event to log when the file is skipped.
+    event: Optional[str] = None
+    # Set when the file was skipped because it failed validation.
+    validation: Optional[validators.ValidationResult] = None
+    # Seconds spent in each stage ("cache", "identify", "read", "validate")
+    # for the caller to record, as this runs in worker processes.
+    timings: Optional[Dict[str, float]] = None
+    # Only for streamed files, from their first row, so callers know it
+    # before ingesting them. Otherwise it's in `df`.
+    purchase_order_id: Optional[str] = None
+
+
+################################################################################
+# Errors
+################################################################################
+class RejectedFile(ValueError):
+    """
+    Raised by `stream_file` when a chunk shows that the file should have been
+    skipped, so callers can reject it like `parse_file` would have.
+    """
+
+    def __init__(
+        self,
+        file: Path,
+        event: str,
+        validation: Optional[validators.ValidationResult] = None,
+    ):
+        message = f"{event}: {file.name}"
+        if validation is not None:
+            message += f"\n{validation.describe()}"
+        super().__init__(message)
+        self.event = event
+        self.validation = validation
+
+
+################################################################################
+# Functions
+################################################################################
+def _columns_and_validator(kind: str):
+    if kind == PURCHASE_ORDER:
+        return identifiers.PURCHASE_ORDER_COLUMNS, validators.purchase_order
+    return identifiers.INVOICE_COLUMNS, validators.invoice
+
+
+def _purchase_order_id(file: Path, kind: str) -> Optional[str]:
+    columns, _ = _columns_and_validator(kind)
+    row = identifiers.read_first_row(file)
+    index = columns.index("PO Number")
+    if index >= len(row) or row[index] is None:
+        return None
+    return str(row[index])
+
+
+def parse_file(
+    file: Path,
+    backend: str = "openpyxl",
+    streaming_threshold: Optional[int] = None,
+    cache_dir: Optional[Path] = None,
+    cache_key: Optional[str] = None,
+) -> ParsedFile:
+    """
+    Decode the first sheet of a workbook and validate it as either a purchase
+    order or an invoice. Amounts are converted to int64 cents as soon as the
+    sheet is read.
+
+    The header row is sniffed first, so unsupported workbooks are skipped
+    without being fully loaded. Files larger than `streaming_threshold` bytes
+    are only classified, and their purchase order read from the first row;
+    they are left for the caller to `stream_file`.
+
+    With a `cache_dir`, the validated frame is cached under `cache_key` (see
+    `caches.store_frame`) and later calls with the same key skip the workbook
+    altogether.
+
+    Runs inside worker processes, so it must not touch the database.
+    """
+    timings: Dict[str, float] = {}
+    cached = None
+    if cache_dir is not None and cache_key is not None:
+        with metrics.timed(timings, "cache"):
+            cached = caches.load_frame(cache_dir, cache_key, ["kind"])
+    if cached is not None:
+        return ParsedFile(file, cached.attributes["kind"], cached.df, timings=timings)
+
+    with metrics.timed(timings, "identify"):
+        kind = identifiers.by_header(file)
+    if kind is None:
+        return ParsedFile(file, None, None, "Unsupported Format", timings=timings)
+
+    if streaming_threshold is not None and file.stat().st_size > streaming_threshold:
+        with metrics.timed(timings, "identify"):
+            purchase_order_id = _purchase_order_id(file, kind)
+        return ParsedFile(
+            file, kind, None, timings=timings, purchase_order_id=purchase_order_id
+        )
+
+    with metrics.timed(timings, "read"):
+        df = money.parse_amounts(readers.read(file, backend))
+    if df.empty:
+        return ParsedFile(file, None, None, "No data", timings=timings)
+
+    columns, validate = _columns_and_validator(kind)
+    with metrics.timed(timings, "identify"):
+        identified = identifiers.by_columns(df, columns)
+    if not identified:
+        return ParsedFile(file, None, None, "Unsupported Format", timings=timings)
+
+    with metrics.timed(timings, "validate"):
+        validation = validate(df)
+    if not validation.ok:
+        return ParsedFile(file, None, None, "Failed Validation", validation, timings)
+
+    if cache_dir is not None and cache_key is not None:
+        with metrics.timed(timings, "cache"):
+            caches.store_frame(cache_dir, cache_key, df, kind=kind)
+    return ParsedFile(file, kind, df, timings=timings)
+
+
+def parse_files(
+    files: Iterable[Path],
+    max_workers: Optional[int] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+    cache_keys: Optional[Dict[Path, str]] = None,
+    **kwargs,
+) -> Iterator[ParsedFile]:
+    """
+    Parse files across a pool of processes, yielding results in the same order
+    as `files`. Each file's cache key is looked up in `cache_keys`; other
+    keyword arguments are passed on to `parse_file`.
+
+    A long-lived `executor` can be passed in to keep its workers warm between
+    calls; otherwise a pool of `max_workers` is created for this call.
+
+    At most `2 * max_workers` files are in flight at once so parsed frames
+    don't pile up in memory while the database stage catches up.
+
+    A file whose parsing raises is skipped with `FAILED_TO_PARSE` rather than
+    stopping the rest.
+    """
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            yield from parse_files(files, max_workers, executor, cache_keys, **kwargs)
+        return
+
+    max_workers = max_workers or cpu_count() or 1
+    parse = partial(parse_file, **kwargs)
+
+    in_flight = deque()
+    for file in files:
+        cache_key = cache_keys.get(file) if cache_keys is not None else None
+        in_flight.append((file, executor.submit(parse, file, cache_key=cache_key)))
+        if len(in_flight) >= 2 * max_workers:
+            yield _result(*in_flight.popleft())
+
+    while in_flight:
+        yield _result(*in_flight.popleft())
+
+
+def _result(file: Path, future: Future) -> ParsedFile:
+    try:
+        return future.result()
+    except Exception as e:
+        logging.error(f"{file.name}: {e!r}")
+        return ParsedFile(file, None, None, FAILED_TO_PARSE)
+
+
+def stream_file(
+    file: Path, kind: str, chunk_size: int, backend: str = "openpyxl"
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield validated chunks of a purchase order or invoice, with amounts in
+    cents.
+
+    Raises `RejectedFile` with the same events as `parse_file` as soon as a
+    chunk fails validation, so callers should ingest chunks inside a
+    transaction they can roll back.
+    """
+    columns, validate = _columns_and_validator(kind)
+    state = validators.StreamState()
+
+    empty = True
+    for chunk in readers.read_chunks(file, chunk_size, backend):
+        chunk = money.parse_amounts(chunk)
+        if not identifiers.by_columns(chunk, columns):
+            raise RejectedFile(file, "Unsupported Format")
+        validation = validate(chunk, state)
+        if not validation.ok:
+            raise RejectedFile(file, "Failed Validation", validation)
+        empty = False
+        yield chunk
+
+    if empty:
+        raise RejectedFile(file, "No data")
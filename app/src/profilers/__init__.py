@@ -0,0 +1,13 @@
+from .profilers import (
+    Profile,
+    Scope,
+    StatementStats,
+    collect,
+    explain,
+    install,
+    merge,
+    reset,
+    scope,
+    summary,
+    totals,
+)
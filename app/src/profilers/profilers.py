@@ -0,0 +1,231 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import re
+from sqlalchemy import Engine, event
+import threading
+import time
+from typing import Dict, Iterator, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+# Statements are only explained when re-running them can be rolled back.
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+################################################################################
+# Return Types
+################################################################################
+class Scope(NamedTuple):
+    """
+    What the statements executed inside `scope` are attributed to.
+    """
+
+    stage: Optional[str] = None
+    file: Optional[str] = None
+    purchase_order: Optional[str] = None
+
+
+class StatementStats(NamedTuple):
+    count: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    # As reported by the cursor: rows returned or affected.
+    rows: int = 0
+
+    def add(self, other: "StatementStats") -> "StatementStats":
+        return StatementStats(
+            self.count + other.count,
+            self.seconds + other.seconds,
+            max(self.max_seconds, other.max_seconds),
+            self.rows + other.rows,
+        )
+
+
+# Stats of each statement, in each scope it was executed in.
+Profile = Dict[Tuple[Scope, str], StatementStats]
+
+
+################################################################################
+# Recording
+################################################################################
+_scope: ContextVar[Scope] = ContextVar("sql_profile_scope", default=Scope())
+_lock = threading.Lock()
+_profile: Profile = {}
+
+
+@contextmanager
+def scope(**labels: Optional[str]) -> Iterator[Scope]:
+    """
+    Attribute the statements executed in the block to `labels` (see `Scope`);
+    those that are None are kept from the enclosing scope. Follows asyncio
+    tasks and SQLAlchemy's `run_sync`, but not new threads.
+    """
+    labels = {name: value for name, value in labels.items() if value is not None}
+    token = _scope.set(_scope.get()._replace(**labels))
+    try:
+        yield _scope.get()
+    finally:
+        _scope.reset(token)
+
+
+def normalize(statement: str) -> str:
+    return re.sub(r"\s+", " ", statement).strip()
+
+
+def add(statement: str, seconds: float, rows: int):
+    key = (_scope.get(), normalize(statement))
+    with _lock:
+        _profile[key] = _profile.get(key, StatementStats()).add(
+            StatementStats(1, seconds, seconds, rows)
+        )
+
+
+def collect() -> Profile:
+    with _lock:
+        return dict(_profile)
+
+
+def merge(profile: Profile):
+    with _lock:
+        for key, stats in profile.items():
+            _profile[key] = _profile.get(key, StatementStats()).add(stats)
+
+
+def reset():
+    with _lock:
+        _profile.clear()
+
+
+def explain(connection, statement: str, parameters) -> Optional[str]:
+    """
+    `EXPLAIN (ANALYZE, BUFFERS)` output for a statement that just ran on
+    `connection`. ANALYZE runs it again, so it's run inside a SAVEPOINT that
+    is rolled back: the only lasting effect of explaining an INSERT is a gap
+    in the ids it draws from a sequence. Statements that can't run twice get
+    the estimated plan instead.
+    """
+    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+
+    # A raw cursor, so explaining doesn't fire the engine's events again.
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT sql_profile_explain")
+        try:
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+            except Exception:
+                # Running it again failed, e.g. inserting the same primary key
+                # twice, so settle for the estimated plan.
+                cursor.execute("ROLLBACK TO SAVEPOINT sql_profile_explain")
+                cursor.execute(f"EXPLAIN {statement}", parameters)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.execute("ROLLBACK TO SAVEPOINT sql_profile_explain")
+            cursor.execute("RELEASE SAVEPOINT sql_profile_explain")
+    finally:
+        cursor.close()
+
+
+def install(engine: Engine, slow_seconds: float = 0):
+    """
+    Profile every statement `engine` executes. Those slower than
+    `slow_seconds` are logged with their plan; 0 turns that off. For an
+    `AsyncEngine`, pass its `sync_engine`.
+
+    Statements that bypass SQLAlchemy, like `ingestors.bulk`'s COPY, aren't
+    seen.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        # On the statement's context rather than the connection: a statement
+        # that raises never reaches `after_cursor_execute`.
+        if context is not None:
+            context.sql_profile_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        start = getattr(context, "sql_profile_start", None)
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        add(statement, seconds, max(cursor.rowcount, 0))
+        if not slow_seconds or seconds < slow_seconds:
+            return
+
+        try:
+            if (
+                executemany
+                and isinstance(parameters, Sequence)
+                and not isinstance(parameters, Mapping)
+                and parameters
+            ):
+                # The plan of the first set of parameters is representative.
+                # Batches of "insertmanyvalues" already come as one set.
+                parameters = parameters[0]
+            plan = explain(connection, statement, parameters)
+        except Exception as e:
+            plan = f"Could not explain: {e}"
+        logging.warning(
+            f"Slow statement ({seconds:.3f}s) in {_scope.get()}:\n"
+            f"{normalize(statement)}" + (f"\n{plan}" if plan is not None else "")
+        )
+
+
+################################################################################
+# Summary
+################################################################################
+def totals(by: str, profile: Optional[Profile] = None) -> Dict[str, StatementStats]:
+    """
+    Stats of every statement added up by one of `Scope`'s fields. Statements
+    executed outside of any such scope are left out.
+    """
+    profile = collect() if profile is None else profile
+    found: Dict[str, StatementStats] = {}
+    for (statement_scope, _), stats in profile.items():
+        value = getattr(statement_scope, by)
+        if value is not None:
+            found[value] = found.get(value, StatementStats()).add(stats)
+    return found
+
+
+def _table(title: str, rows: Dict[str, StatementStats], top: int) -> str:
+    ranked = sorted(rows.items(), key=lambda x: x[1].seconds, reverse=True)[:top]
+    lines = [f"{title}:"]
+    for name, stats in ranked:
+        lines.append(
+            f"  {stats.seconds:9.3f}s {stats.count:7d} statements "
+            f"{stats.rows:9d} rows  max {stats.max_seconds:.3f}s  {name}"
+        )
+    return "\n".join(lines)
+
+
+def summary(top: int = 10, profile: Optional[Profile] = None) -> str:
+    """
+    The stages, files, purchase orders and statements that took the most
+    time, `top` of each.
+    """
+    profile = collect() if profile is None else profile
+    statements: Dict[str, StatementStats] = {}
+    for (statement_scope, statement), stats in profile.items():
+        name = f"[{statement_scope.stage or '-'}] {statement[:200]}"
+        statements[name] = statements.get(name, StatementStats()).add(stats)
+
+    total = StatementStats()
+    for stats in profile.values():
+        total = total.add(stats)
+
+    return "\n".join(
+        [
+            f"SQL profile: {total.count} statements, {total.seconds:.3f}s, "
+            f"{total.rows} rows",
+            _table("By stage", totals("stage", profile), top),
+            _table("By file", totals("file", profile), top),
+            _table("By purchase order", totals("purchase_order", profile), top),
+            _table("By statement", statements, top),
+        ]
+    )
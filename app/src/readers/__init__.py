@@ -0,0 +1 @@
+from .readers import read, read_chunks, register_reader, READERS
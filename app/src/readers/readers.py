@@ -0,0 +1,106 @@
+from openpyxl import load_workbook
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+# A reader yields the first sheet of a workbook as DataFrames of at most
+# `chunk_size` rows, with the header row used as column names.
+Reader = Callable[[Path, int], Iterator[pd.DataFrame]]
+
+READERS: Dict[str, Reader] = {}
+
+
+def register_reader(name: str) -> Callable[[Reader], Reader]:
+    """
+    Register a streaming reader backend under `name`. Backend names double as
+    the `pd.read_excel` engine used when a file is read in one go.
+    """
+
+    def decorator(reader: Reader) -> Reader:
+        READERS[name] = reader
+        return reader
+
+    return decorator
+
+
+################################################################################
+# Functions
+################################################################################
+def read(file: Path, backend: str = "openpyxl") -> pd.DataFrame:
+    """
+    Read the whole first sheet into memory.
+    """
+    return pd.read_excel(file, sheet_name=0, engine=backend)
+
+
+def read_chunks(
+    file: Path, chunk_size: int, backend: str = "openpyxl"
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream the first sheet in chunks of at most `chunk_size` rows.
+
+    Chunks are indexed by their row position in the sheet, so row numbers
+    reported against a chunk refer to the whole sheet.
+    """
+    if backend not in READERS:
+        raise ValueError(f"Unknown reader backend: {backend}")
+    return READERS[backend](file, chunk_size)
+
+
+def _chunks(
+    rows: Iterator[tuple], chunk_size: int, header: Optional[List] = None
+) -> Iterator[pd.DataFrame]:
+    if header is None:
+        header = list(next(rows, ()))
+    # Sheets may report a wider dimension than the data actually has.
+    while header and header[-1] is None:
+        header.pop()
+    width = len(header)
+
+    start = 0
+    buffer = []
+    for row in rows:
+        row = row[:width]
+        if all(value is None or value == "" for value in row):
+            continue
+        buffer.append(row)
+        if len(buffer) == chunk_size:
+            yield pd.DataFrame(
+                buffer, columns=header, index=range(start, start + len(buffer))
+            )
+            start += len(buffer)
+            buffer = []
+
+    if buffer:
+        yield pd.DataFrame(
+            buffer, columns=header, index=range(start, start + len(buffer))
+        )
+
+
+################################################################################
+# Backends
+################################################################################
+@register_reader("openpyxl")
+def openpyxl_chunks(file: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        yield from _chunks(sheet.iter_rows(values_only=True), chunk_size)
+    finally:
+        workbook.close()
+
+
+@register_reader("calamine")
+def calamine_chunks(file: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Requires the optional `python-calamine` package, a Rust-based reader that
+    is considerably faster than openpyxl.
+    """
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_path(str(file))
+    try:
+        sheet = workbook.get_sheet_by_index(0)
+        yield from _chunks(iter(sheet.iter_rows()), chunk_size)
+    finally:
+        workbook.close()
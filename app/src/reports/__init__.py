@@ -1,7 +1,12 @@
 from .reports import (
-    items_not_in_purchase_order,
-    purchase_order_lines_without_invoice,
-    raw_data,
-    summary_and_reconciliation,
+    Chunks,
+    Claim,
+    ReportData,
+    report_data,
     create_report_db_records,
+    data_versions,
+    enqueue,
+    claim,
+    finish,
+    release,
 )
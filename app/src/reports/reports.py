@@ -1,9 +1,34 @@
-from models import Invoice, InvoiceLineItem, PurchaseOrderLineItem, Report
+from datetime import datetime, timedelta
+from functools import partial
+import money
+from models import (
+    Invoice,
+    InvoiceLineItem,
+    InvoicedItem,
+    PurchaseOrder,
+    PurchaseOrderLineItem,
+    Report,
+    ReportInvoice,
+    ReportJob,
+)
 from numpy import nan
 import pandas as pd
-from sqlalchemy import func
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    Text,
+    cast,
+    delete,
+    func,
+    literal,
+    null,
+    select,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from typing import NamedTuple, Union
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Union
 
 
 ################################################################################
@@ -14,9 +39,41 @@ class SummaryAndReconciliationReport(NamedTuple):
     reconciliation_report: pd.DataFrame
 
 
-class RawData(NamedTuple):
+class Chunks:
+    """
+    A section read in chunks. Every iteration calls `chunks` again (e.g. runs
+    its query again), so each report sink gets the whole section.
+    """
+
+    def __init__(self, chunks: Callable[[], Iterator[pd.DataFrame]]):
+        self.chunks = chunks
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        return self.chunks()
+
+
+class ReportData(NamedTuple):
+    summary: pd.DataFrame
+    reconciliation_report: pd.DataFrame
+    items_not_in_purchase_order: pd.DataFrame
+    purchase_order_lines_without_invoice: pd.DataFrame
     purchase_order_lines: pd.DataFrame
-    invoice_lines: pd.DataFrame
+    # Chunks when the report is streamed, see `report_data`.
+    invoice_lines: Union[pd.DataFrame, Chunks]
+    # Set for delta reports: the invoice sections (items not in the purchase
+    # order and the raw invoice lines) only cover invoices added since this
+    # report. Summary and reconciliation are always cumulative.
+    previous_report_id: Optional[int] = None
+
+
+class Claim(NamedTuple):
+    """
+    Jobs taken by `claim`. `claimed_at` tells them apart from the same
+    purchase orders queued again since.
+    """
+
+    purchase_order_ids: List[str]
+    claimed_at: Optional[datetime] = None
 
 
 def classify_variance(x: Union[int, nan]) -> str:
@@ -31,50 +88,200 @@ def classify_variance(x: Union[int, nan]) -> str:
 
 
 ################################################################################
-# Functions
+# Query
 ################################################################################
-def summary_and_reconciliation(
-    session: Session, purchase_order_id: str
-) -> SummaryAndReconciliationReport:
-    grouped_invoice_items_subq = (
-        session.query(
-            InvoiceLineItem.item_code.label("invoice_item_code"),
-            func.sum(InvoiceLineItem.quantity).label("invoice_quantity"),
-            func.sum(InvoiceLineItem.total_price).label("invoice_total_price"),
+def cents(amount):
+    """
+    NUMERIC(10, 2) column or expression as bigint cents.
+    """
+    return cast(amount * 100, BigInteger)
+
+
+LINES_COLUMNS = [
+    "purchase_order_id",
+    "kind",
+    "invoice_id",
+    "line_number",
+    "item_code",
+    "description",
+    "quantity",
+    "unit_price",
+    "total_price",
+]
+
+
+def is_new_invoice():
+    """
+    Invoices no report has covered yet.
+    """
+    return (
+        ~select(ReportInvoice.id).where(ReportInvoice.invoice_id == Invoice.id).exists()
+    )
+
+
+def lines(
+    session: Session,
+    purchase_order_ids: List[str],
+    new_invoices_only: bool = False,
+    items_not_in_purchase_order_only: bool = False,
+) -> pd.DataFrame:
+    """
+    Every purchase order line and invoice line of the purchase orders, plus
+    their `invoiced_item` totals, in one round-trip. `kind` tells them apart;
+    amounts are int64 cents. With `new_invoices_only`, invoice lines are
+    limited to invoices no report has covered yet; with
+    `items_not_in_purchase_order_only`, to items the purchase order doesn't
+    list (when the rest are streamed, see `invoice_line_chunks`).
+
+    Runs on the session's connection, so it sees the same snapshot as the
+    rest of the report's transaction.
+    """
+    purchase_order_lines = select(
+        PurchaseOrderLineItem.purchase_order_id,
+        literal("purchase_order").label("kind"),
+        cast(null(), Text).label("invoice_id"),
+        PurchaseOrderLineItem.purchase_order_line_number.label("line_number"),
+        PurchaseOrderLineItem.item_code,
+        PurchaseOrderLineItem.description,
+        PurchaseOrderLineItem.quantity,
+        cents(PurchaseOrderLineItem.unit_price).label("unit_price"),
+        cents(PurchaseOrderLineItem.total_price).label("total_price"),
+        # Sort key: line number for purchase order lines, insertion order for
+        # invoice lines.
+        PurchaseOrderLineItem.purchase_order_line_number.label("position"),
+    ).where(PurchaseOrderLineItem.purchase_order_id.in_(purchase_order_ids))
+
+    invoice_lines = (
+        select(
+            Invoice.purchase_order_id,
+            literal("invoice").label("kind"),
+            InvoiceLineItem.invoice_id,
+            cast(null(), Integer).label("line_number"),
+            InvoiceLineItem.item_code,
+            InvoiceLineItem.description,
+            InvoiceLineItem.quantity,
+            cents(InvoiceLineItem.unit_price).label("unit_price"),
+            cents(InvoiceLineItem.total_price).label("total_price"),
+            InvoiceLineItem.id.label("position"),
         )
         .join(Invoice)
-        .filter(Invoice.purchase_order_id == purchase_order_id)
-        .group_by(InvoiceLineItem.item_code, InvoiceLineItem.description)
-        .subquery()
-    )
-
-    report_data = (
-        session.query(
-            func.coalesce(
-                PurchaseOrderLineItem.purchase_order_id, purchase_order_id
-            ).label("purchase_order_id"),
-            func.coalesce(
-                PurchaseOrderLineItem.item_code,
-                grouped_invoice_items_subq.c.invoice_item_code,
-            ).label("item_code"),
-            PurchaseOrderLineItem.quantity.label("po_quantity"),
-            grouped_invoice_items_subq.c.invoice_quantity.label("invoice_quantity"),
-            PurchaseOrderLineItem.total_price.label("po_total_price"),
-            grouped_invoice_items_subq.c.invoice_total_price.label(
-                "invoice_total_price"
-            ),
+        .where(Invoice.purchase_order_id.in_(purchase_order_ids))
+    )
+    if new_invoices_only:
+        invoice_lines = invoice_lines.where(is_new_invoice())
+    if items_not_in_purchase_order_only:
+        invoice_lines = invoice_lines.where(
+            ~select(PurchaseOrderLineItem.id)
+            .where(
+                PurchaseOrderLineItem.purchase_order_id == Invoice.purchase_order_id,
+                PurchaseOrderLineItem.item_code == InvoiceLineItem.item_code,
+            )
+            .exists()
         )
-        .join(
-            grouped_invoice_items_subq,
-            PurchaseOrderLineItem.item_code
-            == grouped_invoice_items_subq.c.invoice_item_code,
-            full=True,
+
+    invoiced_items = select(
+        InvoicedItem.purchase_order_id,
+        literal("invoiced_item").label("kind"),
+        cast(null(), Text).label("invoice_id"),
+        cast(null(), Integer).label("line_number"),
+        InvoicedItem.item_code,
+        InvoicedItem.description,
+        InvoicedItem.quantity,
+        cast(null(), BigInteger).label("unit_price"),
+        cents(InvoicedItem.total_price).label("total_price"),
+        cast(null(), Integer).label("position"),
+    ).where(InvoicedItem.purchase_order_id.in_(purchase_order_ids))
+
+    query = union_all(purchase_order_lines, invoice_lines, invoiced_items).order_by(
+        "purchase_order_id", "kind", "invoice_id", "position"
+    )
+    rows = session.execute(query).all()
+    return pd.DataFrame(
+        [row[: len(LINES_COLUMNS)] for row in rows], columns=LINES_COLUMNS
+    )
+
+
+RAW_INVOICE_LINES_COLUMNS = [
+    "invoice_id",
+    "item_code",
+    "description",
+    "quantity",
+    "unit_price",
+    "total_price",
+]
+
+
+def invoice_line_chunks(
+    session: Session,
+    purchase_order_id: str,
+    chunk_size: int,
+    new_invoices_only: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    The "Raw Data -- Invoice Lines" section, read from a server-side cursor
+    `chunk_size` rows at a time so memory doesn't grow with the number of
+    invoice lines. The query only runs once the chunks are iterated, and
+    must be consumed while the session's transaction is still open.
+    """
+    query = (
+        select(
+            InvoiceLineItem.invoice_id,
+            InvoiceLineItem.item_code,
+            InvoiceLineItem.description,
+            InvoiceLineItem.quantity,
+            cents(InvoiceLineItem.unit_price).label("unit_price"),
+            cents(InvoiceLineItem.total_price).label("total_price"),
         )
-        .filter(PurchaseOrderLineItem.purchase_order_id == purchase_order_id)
-        .all()
+        .join(Invoice)
+        .where(Invoice.purchase_order_id == purchase_order_id)
+        .order_by(InvoiceLineItem.invoice_id, InvoiceLineItem.id)
     )
+    if new_invoices_only:
+        query = query.where(is_new_invoice())
 
-    report_columns = [
+    result = session.execute(query, execution_options={"yield_per": chunk_size})
+    for rows in result.partitions():
+        yield raw_invoice_lines(
+            purchase_order_id, pd.DataFrame(rows, columns=RAW_INVOICE_LINES_COLUMNS)
+        )
+
+
+################################################################################
+# Sections
+################################################################################
+def summary_and_reconciliation(
+    purchase_order_id: str,
+    purchase_order_lines: pd.DataFrame,
+    invoiced_items: pd.DataFrame,
+) -> SummaryAndReconciliationReport:
+    """
+    Each purchase order line against the invoiced totals for its item (one
+    row per item code and description, maintained at ingestion). All variance
+    math is exact integer arithmetic on cents; prices are only turned back
+    into amounts for display.
+    """
+    invoiced = invoiced_items[["item_code", "quantity", "total_price"]].rename(
+        columns={
+            "quantity": "invoice_quantity",
+            "total_price": "invoice_total_price",
+        }
+    )
+    report_df = purchase_order_lines[["item_code", "quantity", "total_price"]].merge(
+        invoiced, how="left", on="item_code"
+    )
+    report_df.insert(0, "purchase_order_id", purchase_order_id)
+    report_df = report_df[
+        [
+            "purchase_order_id",
+            "item_code",
+            "quantity",
+            "invoice_quantity",
+            "total_price",
+            "invoice_total_price",
+        ]
+    ].reset_index(drop=True)
+
+    report_df.columns = [
         "PO Number",
         "Item Code",
         "Ordered Qty",
@@ -82,7 +289,7 @@ def summary_and_reconciliation(
         "Ordered Price",
         "Invoiced Price",
     ]
-    report_df = pd.DataFrame(report_data, columns=report_columns)
+    report_df = report_df.astype({"Ordered Price": "Int64", "Invoiced Price": "Int64"})
     report_df.insert(
         4, "Qty Variance", report_df["Invoiced Qty"] - report_df["Ordered Qty"]
     )
@@ -105,124 +312,301 @@ def summary_and_reconciliation(
         }
     )
 
+    price_columns = ["Ordered Price", "Invoiced Price", "Price Variance"]
+    report_df[price_columns] = report_df[price_columns].apply(money.to_amounts)
+    summary_columns = ["Ordered Price Total", "Invoiced Price Total", "Total Variance"]
+    summary_df[summary_columns] = summary_df[summary_columns].apply(money.to_amounts)
+
     return SummaryAndReconciliationReport(summary_df, report_df)
 
 
 def items_not_in_purchase_order(
-    session: Session, purchase_order_id: str
+    purchase_order_lines: pd.DataFrame, invoice_lines: pd.DataFrame
 ) -> pd.DataFrame:
-    subq = (
-        session.query(PurchaseOrderLineItem.id)
-        .filter(
-            PurchaseOrderLineItem.purchase_order_id == Invoice.purchase_order_id,
-            PurchaseOrderLineItem.item_code == InvoiceLineItem.item_code,
-        )
-        .exists()
+    not_in_purchase_order = ~invoice_lines["item_code"].isin(
+        purchase_order_lines["item_code"]
     )
-
-    query = (
-        session.query(
-            InvoiceLineItem.invoice_id,
-            InvoiceLineItem.item_code,
-            InvoiceLineItem.description,
-            InvoiceLineItem.quantity,
-            InvoiceLineItem.unit_price,
-            InvoiceLineItem.total_price,
-        )
-        .join(Invoice)
-        .filter(Invoice.purchase_order_id == purchase_order_id)
-        .filter(~subq)
+    df = invoice_lines.loc[
+        not_in_purchase_order,
+        [
+            "invoice_id",
+            "item_code",
+            "description",
+            "quantity",
+            "unit_price",
+            "total_price",
+        ],
+    ].reset_index(drop=True)
+    df[["unit_price", "total_price"]] = df[["unit_price", "total_price"]].apply(
+        money.to_amounts
     )
-
-    return pd.read_sql(query.statement, session.bind)
+    return df
 
 
 def purchase_order_lines_without_invoice(
-    session: Session,
     purchase_order_id: str,
+    purchase_order_lines: pd.DataFrame,
+    invoiced_items: pd.DataFrame,
 ) -> pd.DataFrame:
-
-    subq = (
-        session.query(InvoiceLineItem.id)
-        .join(Invoice)
-        .filter(
-            Invoice.purchase_order_id == purchase_order_id,
-            InvoiceLineItem.item_code == PurchaseOrderLineItem.item_code,
-        )
-        .exists()
+    without_invoice = ~purchase_order_lines["item_code"].isin(
+        invoiced_items["item_code"]
     )
+    df = purchase_order_lines.loc[without_invoice]
+    return pd.DataFrame(
+        {
+            "PO Number": purchase_order_id,
+            "Item Code": df["item_code"],
+            "Description": df["description"],
+            "Ordered Qty": df["quantity"],
+            "Unit Price": money.to_amounts(df["unit_price"]),
+            "Total Price": money.to_amounts(df["total_price"]),
+        }
+    ).reset_index(drop=True)
 
-    query = (
-        session.query(
-            PurchaseOrderLineItem.purchase_order_id.label("PO Number"),
-            PurchaseOrderLineItem.item_code.label("Item Code"),
-            PurchaseOrderLineItem.description.label("Description"),
-            PurchaseOrderLineItem.quantity.label("Ordered Qty"),
-            PurchaseOrderLineItem.unit_price.label("Unit Price"),
-            PurchaseOrderLineItem.total_price.label("Total Price"),
+
+def raw_purchase_order_lines(
+    purchase_order_id: str, purchase_order_lines: pd.DataFrame
+) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "PO Number": purchase_order_id,
+            "PO Line": purchase_order_lines["line_number"],
+            "Item Code": purchase_order_lines["item_code"],
+            "Description": purchase_order_lines["description"],
+            "Ordered Qty": purchase_order_lines["quantity"],
+            "Unit Price": money.to_amounts(purchase_order_lines["unit_price"]),
+            "Total Price": money.to_amounts(purchase_order_lines["total_price"]),
+        }
+    ).reset_index(drop=True)
+
+
+def raw_invoice_lines(
+    purchase_order_id: str, invoice_lines: pd.DataFrame
+) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "PO Number": purchase_order_id,
+            "Item Code": invoice_lines["item_code"],
+            "Description": invoice_lines["description"],
+            "Invoiced Qty": invoice_lines["quantity"],
+            "Unit Price": money.to_amounts(invoice_lines["unit_price"]),
+            "Total Price": money.to_amounts(invoice_lines["total_price"]),
+            "Invoice Number": invoice_lines["invoice_id"],
+        }
+    ).reset_index(drop=True)
+
+
+################################################################################
+# Functions
+################################################################################
+def data_versions(session: Session, purchase_order_ids: List[str]) -> Dict[str, str]:
+    """
+    A cheap fingerprint of each purchase order's data: the number of its
+    invoices and when the latest was ingested. Purchase order lines never
+    change and invoices are only ever added, so a report built from the same
+    version has the same contents.
+    """
+    rows = session.execute(
+        select(
+            PurchaseOrder.id,
+            func.count(Invoice.id),
+            func.max(Invoice.created_at),
         )
-        .filter(PurchaseOrderLineItem.purchase_order_id == purchase_order_id)
-        .filter(~subq)
+        .outerjoin(Invoice, Invoice.purchase_order_id == PurchaseOrder.id)
+        .where(PurchaseOrder.id.in_(purchase_order_ids))
+        .group_by(PurchaseOrder.id)
+    ).all()
+    return {
+        id: f"{count}:{latest.isoformat() if latest else ''}"
+        for id, count, latest in rows
+    }
+
+
+def previous_reports(session: Session, purchase_order_ids: List[str]) -> Dict[str, int]:
+    """
+    The id of the latest report of each purchase order that has one.
+    """
+    return dict(
+        session.execute(
+            select(Report.purchase_order_id, func.max(Report.id))
+            .where(Report.purchase_order_id.in_(purchase_order_ids))
+            .group_by(Report.purchase_order_id)
+        ).all()
     )
 
-    return pd.read_sql(query.statement, session.bind)
 
+def report_data(
+    session: Session,
+    purchase_order_ids: List[str],
+    delta: bool = False,
+    stream_chunk_rows: Optional[int] = None,
+) -> Dict[str, ReportData]:
+    """
+    Everything the purchase orders' reports need, keyed by purchase order id.
 
-def raw_data(session: Session, purchase_order_id: str) -> RawData:
-    # --- PO Lines ---
-    po_query = (
-        session.query(
-            PurchaseOrderLineItem.purchase_order_id.label("PO Number"),
-            PurchaseOrderLineItem.purchase_order_line_number.label("PO Line"),
-            PurchaseOrderLineItem.item_code.label("Item Code"),
-            PurchaseOrderLineItem.description.label("Description"),
-            PurchaseOrderLineItem.quantity.label("Ordered Qty"),
-            PurchaseOrderLineItem.unit_price.label("Unit Price"),
-            PurchaseOrderLineItem.total_price.label("Total Price"),
-        )
-        .filter(PurchaseOrderLineItem.purchase_order_id == purchase_order_id)
-        .order_by(PurchaseOrderLineItem.purchase_order_line_number.asc())
-    )
-
-    po_lines_df = pd.read_sql(po_query.statement, session.bind)
-
-    # --- Invoice Lines ---
-    invoice_query = (
-        session.query(
-            Invoice.purchase_order_id.label("PO Number"),
-            InvoiceLineItem.item_code.label("Item Code"),
-            InvoiceLineItem.description.label("Description"),
-            InvoiceLineItem.quantity.label("Invoiced Qty"),
-            InvoiceLineItem.unit_price.label("Unit Price"),
-            InvoiceLineItem.total_price.label("Total Price"),
-            Invoice.id.label("Invoice Number"),
-        )
-        .join(InvoiceLineItem, Invoice.id == InvoiceLineItem.invoice_id)
-        .filter(Invoice.purchase_order_id == purchase_order_id)
-        .order_by(Invoice.id.asc())
+    One query fetches the lines of every purchase order in the batch; each
+    report's sections are then derived client-side from its own lines, so the
+    number of round-trips doesn't grow with the number of purchase orders.
+
+    With `delta`, purchase orders that already have a report only get the
+    invoices added since then (see `ReportData.previous_report_id`), so the
+    cost follows the change rather than the purchase order's history.
+
+    With `stream_chunk_rows`, each report's raw invoice lines are `Chunks`
+    read from a server-side cursor (see `invoice_line_chunks`) instead of one
+    DataFrame, and the batch query only fetches the invoice
+    lines the other sections need.
+    """
+    previous = previous_reports(session, purchase_order_ids) if delta else {}
+    df = lines(
+        session,
+        purchase_order_ids,
+        new_invoices_only=delta,
+        items_not_in_purchase_order_only=stream_chunk_rows is not None,
     )
+    by_purchase_order = dict(list(df.groupby("purchase_order_id", sort=False)))
 
-    invoice_lines_df = pd.read_sql(invoice_query.statement, session.bind)
+    data = {}
+    for purchase_order_id in purchase_order_ids:
+        po_df = by_purchase_order.get(purchase_order_id, df.iloc[:0])
+        purchase_order_lines = po_df[po_df["kind"] == "purchase_order"]
+        invoice_lines = po_df[po_df["kind"] == "invoice"]
+        invoiced_items = po_df[po_df["kind"] == "invoiced_item"]
 
-    return RawData(po_lines_df, invoice_lines_df)
+        summary, reconciliation_report = summary_and_reconciliation(
+            purchase_order_id, purchase_order_lines, invoiced_items
+        )
+        data[purchase_order_id] = ReportData(
+            summary,
+            reconciliation_report,
+            items_not_in_purchase_order(purchase_order_lines, invoice_lines),
+            purchase_order_lines_without_invoice(
+                purchase_order_id, purchase_order_lines, invoiced_items
+            ),
+            raw_purchase_order_lines(purchase_order_id, purchase_order_lines),
+            (
+                raw_invoice_lines(purchase_order_id, invoice_lines)
+                if stream_chunk_rows is None
+                else Chunks(
+                    partial(
+                        invoice_line_chunks,
+                        session,
+                        purchase_order_id,
+                        stream_chunk_rows,
+                        delta,
+                    )
+                )
+            ),
+            previous.get(purchase_order_id),
+        )
+    return data
 
 
 def create_report_db_records(
     session: Session,
-    purchase_order_id: str,
+    purchase_order_ids: List[str],
 ):
     """
-    Creates a report which is not currently used by the application, but
-    may later be used for auditing.
+    Creates a report for each purchase order, which is not currently used by
+    the application, but may later be used for auditing.
     """
-    report = Report(purchase_order_id=purchase_order_id)
-    session.add(report)
-    session.flush()
+    report_ids = session.scalars(
+        insert(Report).returning(Report.id),
+        [{"purchase_order_id": id} for id in purchase_order_ids],
+    ).all()
 
-    invoices = (
-        session.query(Invoice)
-        .filter(Invoice.purchase_order_id == purchase_order_id)
-        .all()
+    session.execute(
+        insert(ReportInvoice).from_select(
+            ["report_id", "invoice_id"],
+            select(Report.id, Invoice.id)
+            .join(Invoice, Invoice.purchase_order_id == Report.purchase_order_id)
+            .where(Report.id.in_(report_ids)),
+        )
     )
 
-    report.invoices.extend(invoices)
+
+################################################################################
+# Queue
+################################################################################
+def enqueue(session: Session, purchase_order_id: str) -> bool:
+    """
+    Queue a report for the purchase order, unless one is already pending. A
+    job a worker has already claimed is put back on the queue, as the
+    worker's snapshot may not include this data. Returns whether a job was
+    added or put back.
+
+    Runs in the caller's transaction, so the job only becomes visible to
+    workers once the data it reports on is committed.
+    """
+    statement = insert(ReportJob).values(purchase_order_id=purchase_order_id)
+    added = session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[ReportJob.purchase_order_id],
+            set_={"claimed_at": None},
+            where=ReportJob.claimed_at.is_not(None),
+        ).returning(ReportJob.purchase_order_id)
+    ).scalar_one_or_none()
+    return added is not None
+
+
+def claim(session: Session, limit: int = 1, timeout_seconds: float = 600) -> Claim:
+    """
+    Take up to `limit` of the oldest pending jobs, skipping jobs other workers
+    are claiming, along with those whose worker claimed them more than
+    `timeout_seconds` ago and never finished (e.g. it died).
+
+    The caller commits straight away, rather than holding the jobs' locks
+    while their reports are generated: ingestion queueing the same purchase
+    orders again would otherwise wait for the reports. Once the reports are
+    committed the jobs are deleted with `finish`, or put back with `release`
+    should they fail.
+    """
+    oldest = (
+        select(ReportJob.purchase_order_id)
+        .where(
+            ReportJob.claimed_at.is_(None)
+            | (
+                ReportJob.claimed_at
+                < func.localtimestamp() - timedelta(seconds=timeout_seconds)
+            )
+        )
+        .order_by(ReportJob.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = session.execute(
+        update(ReportJob)
+        .where(ReportJob.purchase_order_id.in_(oldest))
+        .values(claimed_at=func.localtimestamp())
+        .returning(ReportJob.purchase_order_id, ReportJob.claimed_at)
+    ).all()
+    if not rows:
+        return Claim([])
+    return Claim([row.purchase_order_id for row in rows], rows[0].claimed_at)
+
+
+def claimed_jobs(claim: Claim):
+    """
+    The claim's jobs, unless they were queued again or claimed by another
+    worker since.
+    """
+    return ReportJob.purchase_order_id.in_(claim.purchase_order_ids) & (
+        ReportJob.claimed_at == claim.claimed_at
+    )
+
+
+def finish(session: Session, claim: Claim):
+    """
+    Delete the claim's jobs once their reports are committed. Jobs that were
+    queued again in the meantime stay for the next report.
+    """
+    session.execute(delete(ReportJob).where(claimed_jobs(claim)))
+
+
+def release(session: Session, claim: Claim):
+    """
+    Put the claim's jobs back on the queue, for when their reports failed.
+    """
+    session.execute(
+        update(ReportJob).where(claimed_jobs(claim)).values(claimed_at=None)
+    )
@@ -0,0 +1 @@
+from .sinks import register_sink, rows, sections, write, SCHEMAS, SHEET_NAMES, SINKS
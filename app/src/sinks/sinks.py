@@ -0,0 +1,229 @@
+import pandas as pd
+from pathlib import Path
+from reports import ReportData
+from typing import Callable, Dict, Iterable, Iterator, Union
+import xlsxwriter
+
+# A sink writes one report, given the path to write it to without an
+# extension, and returns the file or directory it wrote.
+Sink = Callable[[Path, ReportData], Path]
+
+SINKS: Dict[str, Sink] = {}
+
+
+def register_sink(name: str) -> Callable[[Sink], Sink]:
+    """
+    Register a report output format under `name`.
+    """
+
+    def decorator(sink: Sink) -> Sink:
+        SINKS[name] = sink
+        return sink
+
+    return decorator
+
+
+################################################################################
+# Schemas
+################################################################################
+# Column types of every section, so files written for different purchase
+# orders (with or without invoices, missing values, ...) share one schema.
+# Amounts are Float64 in currency units; quantities are Int64.
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    "summary": {
+        "Ordered Price Total": "Float64",
+        "Invoiced Price Total": "Float64",
+        "Total Variance": "Float64",
+        "Count of Mismatches": "Int64",
+    },
+    "reconciliation_report": {
+        "PO Number": "string",
+        "Item Code": "string",
+        "Ordered Qty": "Int64",
+        "Invoiced Qty": "Int64",
+        "Qty Variance": "Int64",
+        "Ordered Price": "Float64",
+        "Invoiced Price": "Float64",
+        "Price Variance": "Float64",
+        "Status / Comments": "string",
+    },
+    "items_not_in_purchase_order": {
+        "invoice_id": "string",
+        "item_code": "string",
+        "description": "string",
+        "quantity": "Int64",
+        "unit_price": "Float64",
+        "total_price": "Float64",
+    },
+    "purchase_order_lines_without_invoice": {
+        "PO Number": "string",
+        "Item Code": "string",
+        "Description": "string",
+        "Ordered Qty": "Int64",
+        "Unit Price": "Float64",
+        "Total Price": "Float64",
+    },
+    "purchase_order_lines": {
+        "PO Number": "string",
+        "PO Line": "Int64",
+        "Item Code": "string",
+        "Description": "string",
+        "Ordered Qty": "Int64",
+        "Unit Price": "Float64",
+        "Total Price": "Float64",
+    },
+    "invoice_lines": {
+        "PO Number": "string",
+        "Item Code": "string",
+        "Description": "string",
+        "Invoiced Qty": "Int64",
+        "Unit Price": "Float64",
+        "Total Price": "Float64",
+        "Invoice Number": "string",
+    },
+}
+
+
+SHEET_NAMES = {
+    "summary": "Summary",
+    "reconciliation_report": "Reconciliation Report",
+    "items_not_in_purchase_order": "Items Not In PO",
+    "purchase_order_lines_without_invoice": "PO Lines Without Invoice",
+    "purchase_order_lines": "Raw Data -- PO Lines",
+    "invoice_lines": "Raw Data -- Invoice Lines",
+}
+# Sheet names of delta reports, see `ReportData.previous_report_id`.
+DELTA_SHEET_NAMES = {
+    **SHEET_NAMES,
+    "items_not_in_purchase_order": "New Items Not In PO",
+    "invoice_lines": "Raw Data -- New Invoice Lines",
+}
+
+
+def _chunks(
+    section: Union[pd.DataFrame, Iterable[pd.DataFrame]], schema: Dict[str, str]
+) -> Iterator[pd.DataFrame]:
+    if isinstance(section, pd.DataFrame):
+        section = [section]
+
+    empty = True
+    for chunk in section:
+        empty = False
+        yield chunk[list(schema)].astype(schema)
+    if empty:
+        yield pd.DataFrame(columns=list(schema)).astype(schema)
+
+
+def sections(data: ReportData) -> Dict[str, Iterator[pd.DataFrame]]:
+    """
+    The report's six sections, keyed by name, each as an iterator of at least
+    one chunk cast to `SCHEMAS`. Sections are only read as they're iterated,
+    so a streamed section (see `reports.report_data`) is never held in memory
+    all at once.
+    """
+    return {
+        name: _chunks(getattr(data, name), schema) for name, schema in SCHEMAS.items()
+    }
+
+
+def rows(df: pd.DataFrame, na_rep: str) -> Iterator[tuple]:
+    """
+    Rows of `df` as plain Python values, with missing values as `na_rep`.
+    """
+    columns = [
+        [na_rep if pd.isna(value) else value for value in df[name].tolist()]
+        for name in df.columns
+    ]
+    return zip(*columns)
+
+
+################################################################################
+# Sinks
+################################################################################
+@register_sink("xlsx")
+def xlsx(path: Path, data: ReportData) -> Path:
+    """
+    One workbook with a sheet per section, for people to read. Delta reports
+    (see `ReportData.previous_report_id`) leave out the purchase order's raw
+    lines and label the invoice sheets as new.
+
+    Rows are written one at a time in xlsxwriter's constant memory mode, so
+    memory doesn't grow with the size of the sheets.
+    """
+    file = path.parent / f"{path.name}.xlsx"
+    delta = data.previous_report_id is not None
+    sheet_names = DELTA_SHEET_NAMES if delta else SHEET_NAMES
+
+    file.unlink(missing_ok=True)
+    workbook = xlsxwriter.Workbook(file, {"constant_memory": True})
+    # Same header style as pandas' `to_excel`.
+    header = workbook.add_format(
+        {"bold": True, "border": 1, "align": "center", "valign": "top"}
+    )
+    for name, chunks in sections(data).items():
+        if delta and name == "purchase_order_lines":
+            continue
+
+        worksheet = workbook.add_worksheet(sheet_names[name])
+        columns = list(SCHEMAS[name])
+        worksheet.set_column(0, len(columns) - 1, 20)
+        worksheet.write_row(0, 0, columns, header)
+
+        row = 1
+        for chunk in chunks:
+            for values in rows(chunk, na_rep="--"):
+                worksheet.write_row(row, 0, values)
+                row += 1
+
+    workbook.close()
+    return file
+
+
+@register_sink("csv")
+def csv(path: Path, data: ReportData) -> Path:
+    """
+    A directory with one `<section>.csv` per section; missing values are
+    empty fields.
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    for name, chunks in sections(data).items():
+        (path / f"{name}.csv").unlink(missing_ok=True)
+        with open(path / f"{name}.csv", "w", newline="") as file:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(file, index=False, header=i == 0)
+    return path
+
+
+@register_sink("parquet")
+def parquet(path: Path, data: ReportData) -> Path:
+    """
+    A directory with one `<section>.parquet` per section, each chunk written
+    as a row group. Needs pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path.mkdir(parents=True, exist_ok=True)
+    for name, chunks in sections(data).items():
+        (path / f"{name}.parquet").unlink(missing_ok=True)
+        writer = None
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path / f"{name}.parquet", table.schema)
+            writer.write_table(table)
+        writer.close()
+    return path
+
+
+################################################################################
+# Functions
+################################################################################
+def write(format: str, path: Path, data: ReportData) -> Path:
+    """
+    Existing outputs at `path` are replaced rather than written over, as they
+    may be hard links to other copies (see `caches`).
+    """
+    if format not in SINKS:
+        raise ValueError(f"Unknown report format: {format}")
+    return SINKS[format](path, data)
@@ -1,36 +1,216 @@
-from pandas import Series
+import money
+
+import numpy as np
+import pandas as pd
 from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
 
 
 def validate_file_name(file: Path) -> bool:
     return file.name.startswith("PurchaseOrder") or file.name.startswith("Invoice")
 
 
-def column_po_line(column: Series) -> bool:
+################################################################################
+# Return Types
+################################################################################
+class RuleFailure(NamedTuple):
+    rule: str
+    # Index labels of the failing rows, i.e. their 0-based position in the sheet.
+    rows: List[int]
+
+
+class ValidationResult(NamedTuple):
+    failures: List[RuleFailure]
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    def describe(self, max_rows: int = 10) -> str:
+        """
+        Human readable summary, using spreadsheet row numbers (the header is
+        row 1, so the first data row is row 2).
+        """
+        descriptions = []
+        for failure in self.failures:
+            rows = ", ".join(str(row + 2) for row in failure.rows[:max_rows])
+            if len(failure.rows) > max_rows:
+                rows += f", ... ({len(failure.rows)} rows)"
+            descriptions.append(f"{failure.rule} (rows {rows})")
+        return "; ".join(descriptions)
+
+
+################################################################################
+# State
+################################################################################
+class StreamState:
     """
-    Ensure that the PO Line column...
-        - Starts with 1
-        - Is monotonically increasing
-        - Has a difference of 1 between adjacent values (is ordered)
+    What the rules need to remember about the rows already validated, so rules
+    spanning the whole sheet still hold when it's validated chunk by chunk.
     """
-    return (
-        column.iloc[0] == 1
-        and column.is_monotonic_increasing
-        and (column.diff().iloc[1:] == 1).all()
+
+    def __init__(self):
+        self.first_row: Optional[Dict] = None
+        self.next_po_line = 1
+        self.item_codes = set()
+
+
+################################################################################
+# Rules
+################################################################################
+class Columns(NamedTuple):
+    # Columns as NumPy arrays, keyed by column name. Amount columns are int64
+    # cents and quantity columns are float64.
+    values: Dict[str, np.ndarray]
+    # Masks of the rows without a usable value (blank, not a number, or an
+    # amount that isn't a whole number of cents).
+    missing: Dict[str, np.ndarray]
+
+
+class Rule(NamedTuple):
+    name: str
+    # Returns a boolean mask of the rows that break the rule.
+    failing: Callable[[Columns, StreamState], np.ndarray]
+
+
+def is_constant(column: str) -> Rule:
+    return Rule(
+        f"{column} is constant",
+        lambda c, state: c.values[column] != state.first_row[column],
+    )
+
+
+def is_integer(column: str) -> Rule:
+    return Rule(
+        f"{column} is an integer",
+        lambda c, state: ~(np.mod(c.values[column], 1) == 0),
     )
 
 
-def column_is_constant(column: Series) -> bool:
+def has_at_most_two_decimal_places(column: str) -> Rule:
+    return Rule(
+        f"{column} has at most two decimal places",
+        lambda c, state: c.missing[column],
+    )
+
+
+def is_total(quantity: str, unit_price: str, total: str) -> Rule:
+    """
+    Exact integer arithmetic on cents. Rows whose quantity isn't an integer
+    can't be checked, so they fail this rule too.
+    """
+
+    def failing(c: Columns, state: StreamState) -> np.ndarray:
+        unusable = c.missing[quantity] | ~(np.mod(c.values[quantity], 1) == 0)
+        quantities = np.where(unusable, 0, c.values[quantity]).astype("int64")
+        return unusable | (quantities * c.values[unit_price] != c.values[total])
+
+    return Rule(f"{quantity} x {unit_price} = {total}", failing)
+
+
+def _item_code_is_not_unique(c: Columns, state: StreamState) -> np.ndarray:
+    item_codes = c.values["Item Code"]
+    duplicated = pd.Index(item_codes).duplicated(keep="first")
+    if state.item_codes:
+        duplicated |= np.isin(item_codes, list(state.item_codes))
+    return duplicated
+
+
+def _po_line_is_not_sequential(c: Columns, state: StreamState) -> np.ndarray:
+    """
+    PO Lines must start with 1 and increase by 1 on every row.
+    """
+    po_line = c.values["PO Line"]
+    expected = np.arange(state.next_po_line, state.next_po_line + len(po_line))
+    return ~(po_line == expected)
+
+
+item_code_is_unique = Rule("Item Code is unique", _item_code_is_not_unique)
+po_line_is_sequential = Rule("PO Line is sequential", _po_line_is_not_sequential)
+
+
+PURCHASE_ORDER_RULES = [
+    is_constant("PO Number"),
+    po_line_is_sequential,
+    item_code_is_unique,
+    is_integer("Ordered Qty"),
+    has_at_most_two_decimal_places("Unit Price"),
+    has_at_most_two_decimal_places("Total Amount"),
+    is_total("Ordered Qty", "Unit Price", "Total Amount"),
+]
+INVOICE_RULES = [
+    is_constant("Invoice Number"),
+    is_constant("PO Number"),
+    item_code_is_unique,
+    is_integer("Invoiced Qty"),
+    has_at_most_two_decimal_places("Unit Price"),
+    has_at_most_two_decimal_places("Total Amount"),
+    is_total("Invoiced Qty", "Unit Price", "Total Amount"),
+]
+
+QUANTITY_COLUMNS = {"PO Line", "Ordered Qty", "Invoiced Qty"}
+
+
+def columns_of(df: pd.DataFrame) -> Columns:
+    values = {}
+    missing = {}
+    for name in df.columns:
+        column = df[name]
+        if name in money.AMOUNT_COLUMNS:
+            missing[name] = column.isna().to_numpy()
+            values[name] = column.to_numpy(dtype="int64", na_value=0)
+        elif name in QUANTITY_COLUMNS:
+            # Anything that isn't a number becomes NaN and fails every rule.
+            values[name] = pd.to_numeric(column, errors="coerce").to_numpy(
+                dtype="float64"
+            )
+            missing[name] = np.isnan(values[name])
+        else:
+            values[name] = column.to_numpy()
+            missing[name] = column.isna().to_numpy()
+    return Columns(values, missing)
+
+
+################################################################################
+# Functions
+################################################################################
+def validate(
+    df: pd.DataFrame, rules: List[Rule], state: Optional[StreamState] = None
+) -> ValidationResult:
     """
-    Ensure that the values in a column are all the same.
+    Evaluate every rule over the whole frame and report all failing rows,
+    rather than stopping at the first broken rule.
+
+    Each column is converted to a NumPy array once and every rule is a
+    vectorized expression over those arrays. Amount columns must already be
+    cents (see `money.parse_amounts`). Pass the same `state` for each chunk of
+    a sheet that is validated in chunks.
     """
-    c = column.to_numpy()
-    return (c[0] == c).all()
+    state = state or StreamState()
+    columns = columns_of(df)
+
+    if state.first_row is None and len(df):
+        state.first_row = {name: column[0] for name, column in columns.values.items()}
+
+    failures = []
+    for rule in rules:
+        failing = rule.failing(columns, state)
+        if failing.any():
+            failures.append(RuleFailure(rule.name, df.index[failing].tolist()))
+
+    if "PO Line" in columns.values:
+        state.next_po_line += len(df)
+    if "Item Code" in columns.values:
+        state.item_codes.update(columns.values["Item Code"])
+
+    return ValidationResult(failures)
 
 
-def column_is_integer(column: Series) -> bool:
-    return (column % 1 == 0).all()
+def purchase_order(
+    df: pd.DataFrame, state: Optional[StreamState] = None
+) -> ValidationResult:
+    return validate(df, PURCHASE_ORDER_RULES, state)
 
 
-def column_has_at_most_two_decimal_places(column: Series) -> bool:
-    return column.apply(lambda x: round(x, 2) == x).all()
+def invoice(df: pd.DataFrame, state: Optional[StreamState] = None) -> ValidationResult:
+    return validate(df, INVOICE_RULES, state)
@@ -0,0 +1 @@
+from .watchers import watch
@@ -0,0 +1,118 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+from pathlib import Path
+import select
+import sys
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+# inotify(7) event masks.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+
+
+################################################################################
+# inotify
+################################################################################
+def _inotify(directory: Path) -> Optional[int]:
+    """
+    File descriptor that becomes readable when a file is written to, or moved
+    into, `directory`. None where inotify isn't available (e.g. macOS).
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+    except OSError:
+        return None
+
+    fd = libc.inotify_init1(os.O_CLOEXEC)
+    if fd < 0:
+        return None
+
+    mask = IN_CLOSE_WRITE | IN_MOVED_TO
+    if libc.inotify_add_watch(fd, str(directory).encode(), mask) < 0:
+        os.close(fd)
+        return None
+
+    return fd
+
+
+def _drain(fd: int):
+    while select.select([fd], [], [], 0)[0]:
+        os.read(fd, 64 * 1024)
+
+
+def _watch_inotify(fd: int, settle: float) -> Iterator[None]:
+    try:
+        yield
+        while True:
+            select.select([fd], [], [])
+            # Let the rest of a drop land before handing it over.
+            time.sleep(settle)
+            _drain(fd)
+            yield
+    finally:
+        os.close(fd)
+
+
+################################################################################
+# Polling
+################################################################################
+Snapshot = Dict[str, Tuple[int, int]]
+
+
+def _snapshot(directory: Path) -> Snapshot:
+    snapshot = {}
+    for entry in os.scandir(directory):
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def _has_new_files(current: Snapshot, seen: Snapshot) -> bool:
+    # Files disappearing (e.g. moved out after ingestion) don't count.
+    return any(seen.get(name) != stat for name, stat in current.items())
+
+
+def _watch_polling(directory: Path, interval: float) -> Iterator[None]:
+    seen = previous = _snapshot(directory)
+    yield
+    while True:
+        time.sleep(interval)
+        current = _snapshot(directory)
+        # Only hand files over once they've stopped changing for an interval,
+        # so half-copied workbooks aren't picked up.
+        if _has_new_files(current, seen) and current == previous:
+            seen = current
+            yield
+            current = _snapshot(directory)
+        previous = current
+
+
+################################################################################
+# Functions
+################################################################################
+def watch(
+    directory: Path, poll_interval: float = 2.0, settle: float = 1.0
+) -> Iterator[None]:
+    """
+    Yield once straight away, for whatever is already in `directory`, then
+    again every time new files land in it.
+
+    Uses inotify where available and falls back to polling every
+    `poll_interval` seconds. The caller is expected to rescan the directory
+    each time this yields.
+    """
+    fd = _inotify(directory)
+    if fd is None:
+        logging.info(f"inotify unavailable, polling {directory} for new files")
+        yield from _watch_polling(directory, poll_interval)
+    else:
+        yield from _watch_inotify(fd, settle)
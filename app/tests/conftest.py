@@ -1,9 +1,10 @@
 from dotenv import load_dotenv
 
+from models.base import Base
 import psycopg
 import pytest
 import os
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import Session
 
 
@@ -64,3 +65,14 @@ def db_session(test_engine):
     session.close()
     transaction.rollback()
     connection.close()
+
+
+@pytest.fixture
+def committed_database(test_engine):
+    """
+    For code that opens and commits its own sessions, like `commands`: rather
+    than being rolled back, every table is emptied after the test.
+    """
+    yield test_engine
+    with test_engine.begin() as connection:
+        connection.execute(text(f"TRUNCATE {', '.join(Base.metadata.tables)} CASCADE"))
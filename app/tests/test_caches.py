@@ -0,0 +1,43 @@
+# app/test/test_caches.py
+import caches
+import os
+
+
+def write_report(path, contents: str):
+    (path.parent / f"{path.name}.xlsx").write_text(contents)
+    path.mkdir()
+    (path / "summary.csv").write_text(contents)
+    return [path.parent / f"{path.name}.xlsx", path]
+
+
+def test_store_and_link_report(tmp_path):
+    cache = tmp_path / "cache"
+    first = tmp_path / "report_PO-1.5_20250101_000000"
+    caches.store_report(cache, "key", first, write_report(first, "data"))
+
+    second = tmp_path / "report_PO-1.5_20250102_000000"
+    outputs = caches.link_report(cache, "key", second)
+
+    assert sorted(output.name for output in outputs) == [
+        "report_PO-1.5_20250102_000000",
+        "report_PO-1.5_20250102_000000.xlsx",
+    ]
+    assert caches.has_report(cache, "key")
+    assert not caches.has_report(cache, "other key")
+    assert (second / "summary.csv").read_text() == "data"
+    assert os.path.samefile(second / "summary.csv", first / "summary.csv")
+    assert caches.link_report(cache, "other key", second) is None
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = tmp_path / "cache"
+    for i, key in enumerate(["old", "used", "new"]):
+        path = tmp_path / f"report_{key}"
+        caches.store_report(cache, key, path, write_report(path, "x" * 100))
+        os.utime(cache / key, (i, i))
+    caches.touch(cache / "used")
+
+    removed = caches.evict(cache, max_bytes=400)
+
+    assert [entry.name for entry in removed] == ["old"]
+    assert sorted(entry.name for entry in cache.iterdir()) == ["new", "used"]
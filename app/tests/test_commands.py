@@ -0,0 +1,261 @@
+# app/test/test_commands.py
+import asyncio
+import caches
+from commands import commands
+from concurrent.futures import ThreadPoolExecutor
+from models import IngestedFile, Invoice, PurchaseOrder, Report, ReportJob
+import os
+from pathlib import Path
+import pytest
+import reports
+import shutil
+import sinks
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+FILES_DIR = Path(__file__).resolve().parent.parent / "files" / "input"
+
+
+@pytest.fixture
+def files_dir(tmp_path, monkeypatch, committed_database):
+    for directory in ["input", "output/ingested", "output/reports", "cache"]:
+        (tmp_path / directory).mkdir(parents=True)
+    monkeypatch.setattr(commands, "INPUT_DIR", tmp_path / "input")
+    monkeypatch.setattr(commands, "OUTPUT_DIR", tmp_path / "output")
+    monkeypatch.setattr(commands, "REPORT_CACHE_DIR", tmp_path / "cache" / "reports")
+    monkeypatch.setattr(commands, "PARSE_CACHE_DIR", tmp_path / "cache" / "parsed")
+    return tmp_path
+
+
+def drop(files_dir: Path, *names: str):
+    for name in names:
+        shutil.copy(FILES_DIR / name, files_dir / "input" / name)
+
+
+def names(directory: Path):
+    return sorted(file.name for file in directory.iterdir())
+
+
+def ingest():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        commands.ingest_files(commands.list_input_files(), executor)
+
+
+def report_jobs(database):
+    with Session(database) as session:
+        return session.execute(
+            select(ReportJob.purchase_order_id, ReportJob.claimed_at).order_by(
+                ReportJob.purchase_order_id
+            )
+        ).all()
+
+
+def purchase_order_ids(database):
+    with Session(database) as session:
+        return session.scalars(select(PurchaseOrder.id).order_by("id")).all()
+
+
+################################################################################
+# Ingestion
+################################################################################
+def test_file_that_fails_to_store_rolls_back_alone(
+    files_dir, committed_database, monkeypatch
+):
+    drop(files_dir, "PurchaseOrder_1.xlsx", "PurchaseOrder_2.xlsx", "Invoice_1_1.xlsx")
+    enqueue = reports.enqueue
+
+    def enqueue_failing_for_second(session, purchase_order_id):
+        # After PO-1002's rows are written.
+        if purchase_order_id == "PO-1002":
+            raise RuntimeError("enqueue failed")
+        return enqueue(session, purchase_order_id)
+
+    monkeypatch.setattr(reports, "enqueue", enqueue_failing_for_second)
+    ingest()
+
+    assert names(files_dir / "input") == ["PurchaseOrder_2.xlsx"]
+    assert names(files_dir / "output" / "ingested") == [
+        "Invoice_1_1.xlsx",
+        "PurchaseOrder_1.xlsx",
+    ]
+    assert purchase_order_ids(committed_database) == ["PO-1001"]
+
+
+def test_files_are_moved_once_their_batch_is_committed(
+    files_dir, committed_database, monkeypatch
+):
+    drop(files_dir, "PurchaseOrder_1.xlsx", "PurchaseOrder_2.xlsx")
+    monkeypatch.setattr(commands, "INGEST_BATCH_FILES", 1)
+    move_ingested = commands.move_ingested
+    committed = []
+
+    def move_if_committed(file: Path):
+        with Session(committed_database) as session:
+            committed.append(
+                session.scalar(
+                    select(IngestedFile.file_name).where(
+                        IngestedFile.file_name == file.name
+                    )
+                )
+            )
+        move_ingested(file)
+
+    monkeypatch.setattr(commands, "move_ingested", move_if_committed)
+    ingest()
+
+    assert sorted(committed) == ["PurchaseOrder_1.xlsx", "PurchaseOrder_2.xlsx"]
+    assert names(files_dir / "input") == []
+
+
+def test_batch_that_fails_to_commit_stays_in_input(
+    files_dir, committed_database, monkeypatch
+):
+    drop(files_dir, "PurchaseOrder_1.xlsx", "Invoice_1_1.xlsx")
+    commit = Session.commit
+    commits = []
+
+    def commit_failing_once(session):
+        commits.append(session)
+        if len(commits) == 1:
+            raise RuntimeError("connection lost")
+        commit(session)
+
+    monkeypatch.setattr(Session, "commit", commit_failing_once)
+    ingest()
+
+    assert names(files_dir / "input") == ["Invoice_1_1.xlsx", "PurchaseOrder_1.xlsx"]
+    assert purchase_order_ids(committed_database) == []
+
+    # The next run picks them up again.
+    ingest()
+    assert names(files_dir / "input") == []
+    assert purchase_order_ids(committed_database) == ["PO-1001"]
+
+
+################################################################################
+# Async Ingestion
+################################################################################
+@pytest.mark.parametrize("streaming_threshold", [20_000_000, 1])
+def test_async_invoices_for_a_purchase_order_are_written_one_at_a_time(
+    files_dir, committed_database, monkeypatch, streaming_threshold
+):
+    drop(files_dir, "PurchaseOrder_1.xlsx", "Invoice_1_1.xlsx", "Invoice_1_2.xlsx")
+    monkeypatch.setattr(commands, "STREAMING_THRESHOLD_BYTES", streaming_threshold)
+    write_file = commands.write_file
+    writing = []
+    overlapped = []
+
+    async def slow_write_failing_for_first_invoice(database, parsed, hash):
+        overlapped.append(bool(writing))
+        writing.append(parsed.file)
+        try:
+            await asyncio.sleep(0.05)
+            if parsed.file.name == "Invoice_1_1.xlsx":
+                raise RuntimeError("connection lost")
+            await write_file(database, parsed, hash)
+        finally:
+            writing.remove(parsed.file)
+
+    monkeypatch.setattr(commands, "write_file", slow_write_failing_for_first_invoice)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        asyncio.run(commands.ingest_files_async(commands.list_input_files(), executor))
+
+    # Both invoices were written after the purchase order and one at a time,
+    # and the one that failed didn't stop the other.
+    assert overlapped == [False, False, False]
+    assert names(files_dir / "input") == ["Invoice_1_1.xlsx"]
+    with Session(committed_database) as session:
+        assert session.scalars(select(Invoice.id)).all() == ["INV-502"]
+
+
+################################################################################
+# Reports
+################################################################################
+def test_ingestion_does_not_wait_for_claimed_reports(files_dir, committed_database):
+    drop(files_dir, "PurchaseOrder_1.xlsx")
+    ingest()
+
+    batch = commands.query_report_batch()
+    assert batch.claim.purchase_order_ids == ["PO-1001"]
+    with Session(committed_database) as session:
+        # Fails rather than waiting should the batch hold the job's lock.
+        session.execute(text("SET LOCAL lock_timeout = '1s'"))
+        assert reports.enqueue(session, "PO-1001")
+        session.commit()
+
+    assert commands.write_report_batch(batch) == 1
+    # Queued again since it was claimed, so it stays for the next report.
+    assert report_jobs(committed_database) == [("PO-1001", None)]
+
+
+@pytest.mark.parametrize("depth", [0, 2])
+def test_failed_report_batch_goes_back_on_the_queue(
+    files_dir, committed_database, monkeypatch, depth
+):
+    drop(files_dir, "PurchaseOrder_1.xlsx", "PurchaseOrder_2.xlsx")
+    ingest()
+    monkeypatch.setattr(commands, "REPORT_BATCH_SIZE", 1)
+    monkeypatch.setattr(commands, "REPORT_PIPELINE_DEPTH", depth)
+
+    def failing_write(format, path, data):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(sinks, "write", failing_write)
+    with pytest.raises(RuntimeError, match="disk full"):
+        commands.report_worker()
+
+    assert report_jobs(committed_database) == [("PO-1001", None), ("PO-1002", None)]
+    with Session(committed_database) as session:
+        assert session.scalars(select(Report.id)).all() == []
+
+
+def report_again(files_dir: Path, database) -> Path:
+    """
+    Queue the purchase order's report again, with the reports written so far
+    moved out of the way. Returns where they were moved to.
+    """
+    earlier = files_dir / "earlier"
+    (files_dir / "output" / "reports").rename(earlier)
+    (files_dir / "output" / "reports").mkdir()
+    with Session(database) as session:
+        reports.enqueue(session, "PO-1001")
+        session.commit()
+    return earlier
+
+
+def report_count(database) -> int:
+    with Session(database) as session:
+        return len(session.scalars(select(Report.id)).all())
+
+
+def test_unchanged_report_is_linked_from_cache(files_dir, committed_database):
+    drop(files_dir, "PurchaseOrder_1.xlsx")
+    ingest()
+    assert commands.report_worker() == 1
+    earlier = report_again(files_dir, committed_database)
+
+    assert commands.report_worker() == 1
+
+    [first] = earlier.iterdir()
+    [second] = (files_dir / "output" / "reports").iterdir()
+    assert os.path.samefile(first, second)
+    assert report_count(committed_database) == 1
+
+
+def test_report_evicted_after_its_batch_was_queried_is_written(
+    files_dir, committed_database
+):
+    drop(files_dir, "PurchaseOrder_1.xlsx")
+    ingest()
+    assert commands.report_worker() == 1
+    earlier = report_again(files_dir, committed_database)
+
+    batch = commands.query_report_batch()
+    assert batch.data == {}
+    caches.remove(files_dir / "cache" / "reports", batch.cache_keys["PO-1001"])
+    assert commands.write_report_batch(batch) == 1
+
+    [first] = earlier.iterdir()
+    [second] = (files_dir / "output" / "reports").iterdir()
+    assert not os.path.samefile(first, second)
+    assert report_count(committed_database) == 2
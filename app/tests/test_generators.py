@@ -0,0 +1,29 @@
+# app/test/test_generators.py
+from generators import generate_drop
+from parsers import INVOICE, PURCHASE_ORDER, parse_file
+
+
+def test_generate_drop(tmp_path):
+    drop = generate_drop(tmp_path, purchase_orders=3, invoices_per_order=2)
+    assert len(drop.purchase_orders) == 3
+    assert drop.invalid == []
+
+    parsed = [parse_file(file) for file in drop.purchase_orders + drop.invoices]
+    assert [p.kind for p in parsed[:3]] == [PURCHASE_ORDER] * 3
+    assert all(p.kind == INVOICE for p in parsed[3:])
+    assert sum(len(p.df) for p in parsed) == drop.rows
+
+
+def test_generate_drop_is_repeatable(tmp_path):
+    first = generate_drop(tmp_path / "first", purchase_orders=2, error_rate=0.5)
+    second = generate_drop(tmp_path / "second", purchase_orders=2, error_rate=0.5)
+    assert [f.name for f in first.invalid] == [f.name for f in second.invalid]
+    assert first.rows == second.rows
+
+
+def test_generate_drop_with_errors(tmp_path):
+    drop = generate_drop(tmp_path, purchase_orders=4, error_rate=0.5)
+    assert drop.invalid
+
+    for file in drop.purchase_orders + drop.invoices:
+        assert (parse_file(file).df is None) == (file in drop.invalid)
@@ -0,0 +1,34 @@
+# app/test/test_identifiers.py
+import pandas as pd
+from pathlib import Path
+from zipfile import ZipFile
+from identifiers import INVOICE, PURCHASE_ORDER, by_header
+
+INPUT_DIR = Path(__file__).resolve().parent.parent / "files" / "input"
+
+
+def test_by_header_purchase_order():
+    assert by_header(INPUT_DIR / "PurchaseOrder_1.xlsx") == PURCHASE_ORDER
+
+
+def test_by_header_invoice():
+    assert by_header(INPUT_DIR / "Invoice_1_1.xlsx") == INVOICE
+
+
+def test_by_header_unexpected_columns(tmp_path):
+    file = tmp_path / "Invoice_bad.xlsx"
+    pd.DataFrame({"PO Number": ["PO-1"], "Unexpected": [1]}).to_excel(file, index=False)
+    assert by_header(file) is None
+
+
+def test_by_header_not_a_workbook(tmp_path):
+    file = tmp_path / "Invoice_bad.xlsx"
+    file.write_text("not a workbook")
+    assert by_header(file) is None
+
+
+def test_by_header_zip_without_workbook(tmp_path):
+    file = tmp_path / "Invoice_bad.xlsx"
+    with ZipFile(file, "w") as archive:
+        archive.writestr("readme.txt", "not a workbook either")
+    assert by_header(file) is None
@@ -0,0 +1,145 @@
+# app/test/test_ingestors.py
+import asyncio
+import ingestors
+import money
+import os
+import pandas as pd
+import pytest
+from models import InvoiceLineItem, InvoicedItem, PurchaseOrderLineItem
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+
+def purchase_order_df(**overrides) -> pd.DataFrame:
+    data = {
+        "PO Number": ["PO-12345"] * 3,
+        "PO Line": [1, 2, 3],
+        "Item Code": ["ITEM-001", "ITEM-002", "ITEM-003"],
+        "Description": ['Laptop 15"', "Mouse, wireless", "Keyboard"],
+        "Ordered Qty": [1, 2, 3],
+        "Unit Price": [800.0, 15.5, 25.25],
+        "Total Amount": [800.0, 31.0, 75.75],
+    }
+    data.update(overrides)
+    return money.parse_amounts(pd.DataFrame(data))
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_ingest_purchase_order(db_session, bulk):
+    po_id = ingestors.purchase_order(db_session, purchase_order_df(), bulk)
+    db_session.flush()
+
+    line_items = (
+        db_session.query(PurchaseOrderLineItem)
+        .filter_by(purchase_order_id=po_id)
+        .order_by(PurchaseOrderLineItem.purchase_order_line_number)
+        .all()
+    )
+    assert [line.description for line in line_items] == [
+        'Laptop 15"',
+        "Mouse, wireless",
+        "Keyboard",
+    ]
+    assert [float(line.total_price) for line in line_items] == [800.0, 31.0, 75.75]
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_ingest_purchase_order_with_invalid_total_price(db_session, bulk):
+    df = purchase_order_df(**{"Total Amount": [800.0, 31.0, 1.0]})
+
+    with pytest.raises(IntegrityError):
+        ingestors.purchase_order(db_session, df, bulk)
+        db_session.flush()
+
+
+def invoice_df(invoice_number: str, **overrides) -> pd.DataFrame:
+    data = {
+        "Invoice Number": [invoice_number] * 2,
+        "PO Number": ["PO-12345"] * 2,
+        "Item Code": ["ITEM-001", "ITEM-002"],
+        "Description": ['Laptop 15"', "Mouse, wireless"],
+        "Invoiced Qty": [1, 1],
+        "Unit Price": [800.0, 15.5],
+        "Total Amount": [800.0, 15.5],
+    }
+    data.update(overrides)
+    return money.parse_amounts(pd.DataFrame(data))
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_ingest_invoice_updates_invoiced_items(db_session, bulk):
+    ingestors.purchase_order(db_session, purchase_order_df(), bulk)
+    ingestors.invoice(db_session, invoice_df("INV-1"), bulk)
+    ingestors.invoice(db_session, invoice_df("INV-2"), bulk)
+    db_session.flush()
+
+    invoiced = {
+        item.item_code: (item.quantity, float(item.total_price))
+        for item in db_session.query(InvoicedItem).filter_by(
+            purchase_order_id="PO-12345"
+        )
+    }
+    assert invoiced == {"ITEM-001": (2, 1600.0), "ITEM-002": (2, 31.0)}
+    assert ingestors.rebuild_invoiced_items(db_session).empty
+
+
+def test_rebuild_invoiced_items_repairs_drift(db_session):
+    ingestors.purchase_order(db_session, purchase_order_df())
+    ingestors.invoice(db_session, invoice_df("INV-1"))
+    db_session.flush()
+    db_session.query(InvoicedItem).filter_by(item_code="ITEM-001").delete()
+
+    differences = ingestors.rebuild_invoiced_items(db_session)
+
+    assert differences["item_code"].tolist() == ["ITEM-001"]
+    assert ingestors.rebuild_invoiced_items(db_session).empty
+
+
+def test_ingested_files_by_content_hash(db_session, tmp_path):
+    original = tmp_path / "Invoice_1.xlsx"
+    original.write_bytes(b"contents")
+    renamed = tmp_path / "Invoice_1 (copy).xlsx"
+    renamed.write_bytes(b"contents")
+    other = tmp_path / "Invoice_2.xlsx"
+    other.write_bytes(b"other contents")
+
+    hash = ingestors.file_hash(original)
+    assert hash.size == len(b"contents")
+    assert ingestors.file_hash(renamed) == hash
+    assert ingestors.file_hash(other) != hash
+
+    ingestors.record_file(db_session, hash, original, "Ingested Invoice")
+    ingestors.record_file(db_session, hash, renamed, "Ingested Invoice")
+
+    known = ingestors.ingested_files(
+        db_session, [hash.sha256, ingestors.file_hash(other).sha256]
+    )
+    assert list(known) == [hash.sha256]
+    assert known[hash.sha256].file_name == "Invoice_1.xlsx"
+    assert known[hash.sha256].outcome == "Ingested Invoice"
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_ingest_invoice_in_async_session(bulk):
+    async def ingest():
+        engine = create_async_engine(
+            f"postgresql+psycopg_async://{os.environ['POSTGRES_USER']}:{os.environ['POSTGRES_PASSWORD']}@"
+            f"{os.environ['POSTGRES_HOST']}:{os.environ.get('POSTGRES_PORT', 5433)}/"
+            f"{os.environ['POSTGRES_DB']}"
+        )
+        try:
+            async with AsyncSession(engine) as session:
+                await session.run_sync(
+                    ingestors.purchase_order, purchase_order_df(), bulk
+                )
+                await session.run_sync(ingestors.invoice, invoice_df("INV-1"), bulk)
+                lines = await session.scalar(
+                    select(func.count()).where(InvoiceLineItem.invoice_id == "INV-1")
+                )
+                await session.rollback()
+                return lines
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(ingest()) == 2
@@ -0,0 +1,56 @@
+# app/test/test_main.py
+from commands import commands
+import config
+import main
+from models import PurchaseOrder
+from pathlib import Path
+import reports
+from sqlalchemy.orm import Session
+import subprocess
+import sys
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+
+def test_import_has_no_heavy_dependencies():
+    modules = subprocess.run(
+        [sys.executable, "-c", "import main, sys; print(*sys.modules)"],
+        cwd=SRC_DIR,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.split()
+    for heavy in ["commands", "pandas", "sqlalchemy", "openpyxl", "xlsxwriter"]:
+        assert heavy not in modules
+
+
+def test_ingest_empty_input_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "INPUT_DIR", tmp_path)
+    assert main.main(["ingest"]) == 0
+
+
+def test_report(tmp_path, monkeypatch, committed_database):
+    with Session(committed_database) as session:
+        session.add(PurchaseOrder(id="PO-1"))
+        session.flush()
+        reports.enqueue(session, "PO-1")
+        session.commit()
+    (tmp_path / "reports").mkdir()
+    monkeypatch.setattr(commands, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(commands, "REPORT_CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(commands, "REPORT_WORKERS", 1)
+    monkeypatch.setattr(commands, "METRICS_FILE", tmp_path / "metrics.prom")
+
+    assert main.main(["report"]) == 0
+
+    assert [report.suffix for report in (tmp_path / "reports").iterdir()] == [".xlsx"]
+    assert 'stage="write"' in (tmp_path / "metrics.prom").read_text()
+
+
+def test_legacy_flags():
+    parser = main.parser()
+    assert main.command(parser.parse_args([])) == "ingest"
+    assert main.command(parser.parse_args(["--reports-only"])) == "report"
+    args = parser.parse_args(["--verify-invoiced-items"])
+    assert main.command(args) == "validate"
+    assert args.invoiced_items
@@ -0,0 +1,61 @@
+# app/test/test_metrics.py
+import metrics
+from parsers import parse_file
+from pathlib import Path
+import pytest
+from urllib.request import urlopen
+
+INPUT_DIR = Path(__file__).resolve().parent.parent / "files" / "input"
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_timer_records_histogram():
+    with metrics.timer("read", kind="invoice") as labels:
+        labels["rows"] = 3
+
+    text = metrics.render()
+    series = 'stage="read",kind="invoice",outcome="ok"'
+    assert f'pipeline_stage_duration_seconds_bucket{{{series},le="+Inf"}} 1' in text
+    assert f"pipeline_stage_duration_seconds_count{{{series}}} 1" in text
+    assert f"pipeline_stage_rows_total{{{series}}} 3" in text
+
+
+def test_timer_records_errors():
+    with pytest.raises(ValueError):
+        with metrics.timer("ingest", kind="invoice"):
+            raise ValueError()
+
+    assert 'outcome="error"' in metrics.render()
+
+
+def test_merge():
+    metrics.record("write", 0.2, 10, kind="xlsx", outcome="ok")
+    snapshot = metrics.collect()
+    metrics.merge(snapshot)
+
+    histogram = next(iter(metrics.collect().histograms.values()))
+    assert histogram.count == 2
+    assert histogram.sum == pytest.approx(0.4)
+    assert sum(histogram.buckets) == 2
+
+
+def test_serve():
+    metrics.record("query", 0.01, kind="report", outcome="ok")
+    server = metrics.serve(0, "127.0.0.1")
+    try:
+        port = server.server_address[1]
+        with urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert 'stage="query"' in response.read().decode()
+    finally:
+        server.shutdown()
+
+
+def test_parse_file_timings():
+    parsed = parse_file(INPUT_DIR / "PurchaseOrder_1.xlsx")
+    assert set(parsed.timings) == {"identify", "read", "validate"}
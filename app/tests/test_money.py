@@ -0,0 +1,13 @@
+# app/test/test_money.py
+import money
+import pandas as pd
+
+
+def test_to_cents():
+    cents = money.to_cents(pd.Series([1.5, 0.1, -12.05, 3, 2.675, "x", None]))
+    assert cents.tolist() == [150, 10, -1205, 300, pd.NA, pd.NA, pd.NA]
+
+
+def test_to_text():
+    cents = pd.Series([-1205, 5, 100000], dtype="Int64")
+    assert money.to_text(cents).tolist() == ["-12.05", "0.05", "1000.00"]
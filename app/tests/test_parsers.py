@@ -0,0 +1,97 @@
+# app/test/test_parsers.py
+from concurrent.futures import ThreadPoolExecutor
+import identifiers
+import pandas as pd
+from pathlib import Path
+import pytest
+from parsers import FAILED_TO_PARSE, INVOICE, PURCHASE_ORDER, parse_file, parse_files
+
+INPUT_DIR = Path(__file__).resolve().parent.parent / "files" / "input"
+
+
+def test_parse_purchase_order():
+    parsed = parse_file(INPUT_DIR / "PurchaseOrder_1.xlsx")
+    assert parsed.kind == PURCHASE_ORDER
+    assert parsed.df["PO Number"].iat[0] == "PO-1001"
+
+
+def test_parse_invoice():
+    parsed = parse_file(INPUT_DIR / "Invoice_1_1.xlsx")
+    assert parsed.kind == INVOICE
+    assert parsed.df["Invoice Number"].iat[0] == "INV-501"
+
+
+def test_parse_streamed_invoice_purchase_order():
+    parsed = parse_file(INPUT_DIR / "Invoice_1_1.xlsx", streaming_threshold=1)
+    assert parsed.kind == INVOICE
+    assert parsed.df is None
+    assert parsed.purchase_order_id == "PO-1001"
+
+
+def test_parse_unsupported_format(tmp_path):
+    file = tmp_path / "PurchaseOrder_bad.xlsx"
+    pd.DataFrame({"Unexpected": [1, 2]}).to_excel(file, index=False)
+
+    parsed = parse_file(file)
+    assert parsed.kind is None
+    assert parsed.df is None
+    assert parsed.event == "Unsupported Format"
+
+
+def test_parse_files_preserves_order():
+    files = sorted(INPUT_DIR.iterdir(), key=lambda x: x.name)
+    parsed = list(parse_files(files, max_workers=2))
+    assert [p.file for p in parsed] == files
+
+
+def test_parse_file_from_cache(tmp_path):
+    pytest.importorskip("pyarrow")
+    cache = tmp_path / "cache"
+    parsed = parse_file(
+        INPUT_DIR / "Invoice_1_1.xlsx", cache_dir=cache, cache_key="key"
+    )
+
+    # A cached frame is returned without the workbook being read again.
+    unreadable = tmp_path / "Invoice_1_1.xlsx"
+    unreadable.write_bytes(b"not a workbook")
+    cached = parse_file(unreadable, cache_dir=cache, cache_key="key")
+
+    assert cached.file == unreadable
+    assert cached.kind == INVOICE
+    pd.testing.assert_frame_equal(cached.df, parsed.df)
+    assert parse_file(unreadable, cache_dir=cache, cache_key="other").kind is None
+
+
+def test_parse_file_with_corrupt_cache_entry(tmp_path):
+    pytest.importorskip("pyarrow")
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    (cache / "key.feather").write_bytes(b"ARROW1 truncated")
+
+    parsed = parse_file(
+        INPUT_DIR / "Invoice_1_1.xlsx", cache_dir=cache, cache_key="key"
+    )
+
+    # Parsed from the workbook instead, and cached again.
+    assert parsed.kind == INVOICE
+    cached = parse_file(tmp_path / "missing.xlsx", cache_dir=cache, cache_key="key")
+    pd.testing.assert_frame_equal(cached.df, parsed.df)
+
+
+def test_parse_files_skips_files_that_raise(monkeypatch):
+    files = sorted(INPUT_DIR.iterdir(), key=lambda x: x.name)
+    by_header = identifiers.by_header
+
+    def broken(file):
+        if file == files[1]:
+            raise RuntimeError("worker died")
+        return by_header(file)
+
+    monkeypatch.setattr(identifiers, "by_header", broken)
+    # Threads, so the patch applies in the workers.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        parsed = list(parse_files(files, 2, executor))
+
+    assert [p.file for p in parsed] == files
+    assert parsed[1].event == FAILED_TO_PARSE
+    assert all(p.kind is not None for p in parsed[:1] + parsed[2:])
@@ -0,0 +1,83 @@
+# app/test/test_profilers.py
+import logging
+from models import PurchaseOrder
+import os
+import profilers
+import pytest
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.exc import DataError
+
+
+@pytest.fixture
+def profiled_engine():
+    # Its own engine, as event listeners can't be removed from the shared one.
+    engine = create_engine(
+        f"postgresql+psycopg://{os.environ['POSTGRES_USER']}:{os.environ['POSTGRES_PASSWORD']}@"
+        f"{os.environ['POSTGRES_HOST']}:{os.environ.get('POSTGRES_PORT', 5433)}/"
+        f"{os.environ['POSTGRES_DB']}"
+    )
+    profilers.install(engine, slow_seconds=1e-9)
+    profilers.reset()
+    yield engine
+    profilers.reset()
+    engine.dispose()
+
+
+def test_statements_are_attributed_to_scope(profiled_engine):
+    with profiled_engine.connect() as connection:
+        with profilers.scope(stage="ingest", file="Invoice_1.xlsx"):
+            with profilers.scope(purchase_order="PO-1"):
+                connection.execute(text("SELECT 1 UNION ALL SELECT 2"))
+            connection.execute(text("SELECT 1"))
+        connection.rollback()
+
+    assert profilers.totals("file")["Invoice_1.xlsx"].count == 2
+    assert profilers.totals("file")["Invoice_1.xlsx"].rows == 3
+    assert profilers.totals("purchase_order")["PO-1"].count == 1
+    assert "By purchase order" in profilers.summary()
+
+
+def test_slow_statements_are_explained(profiled_engine, caplog):
+    with caplog.at_level(logging.WARNING), profiled_engine.connect() as connection:
+        connection.execute(
+            text("INSERT INTO purchase_order (id) VALUES ('PO-EXPLAIN')")
+        )
+        # Explaining ran the INSERT again and rolled it back.
+        count = connection.scalar(
+            text("SELECT count(*) FROM purchase_order WHERE id = 'PO-EXPLAIN'")
+        )
+        connection.rollback()
+
+    assert count == 1
+    # The INSERT can't run twice, so it gets the estimated plan; the SELECT
+    # is analyzed.
+    assert "Insert on purchase_order" in caplog.text
+    assert "actual time" in caplog.text
+
+
+def test_slow_bulk_insert_returning_is_explained(profiled_engine, caplog):
+    with caplog.at_level(logging.WARNING), profiled_engine.connect() as connection:
+        # Sent as one "insertmanyvalues" batch, whose parameters are a dict.
+        ids = connection.scalars(
+            insert(PurchaseOrder).returning(PurchaseOrder.id),
+            [{"id": "PO-EXPLAIN-1"}, {"id": "PO-EXPLAIN-2"}],
+        ).all()
+        connection.rollback()
+
+    assert sorted(ids) == ["PO-EXPLAIN-1", "PO-EXPLAIN-2"]
+    assert "Insert on purchase_order" in caplog.text
+
+
+def test_failed_statements_are_not_profiled(profiled_engine):
+    with profiled_engine.connect() as connection:
+        with pytest.raises(DataError):
+            connection.execute(text("SELECT 1 / 0"))
+        connection.rollback()
+        connection.execute(text("SELECT 2"))
+        connection.rollback()
+        # Nothing left behind on the pooled connection for later statements.
+        assert not connection.info.get("sql_profile_starts")
+
+    statements = [statement for (_, statement) in profilers.collect()]
+    assert "SELECT 2" in statements
+    assert "SELECT 1 / 0" not in statements
@@ -0,0 +1,37 @@
+# app/test/test_readers.py
+import pandas as pd
+import pytest
+from pathlib import Path
+from parsers import PURCHASE_ORDER, RejectedFile, stream_file
+from readers import read, read_chunks
+
+INPUT_DIR = Path(__file__).resolve().parent.parent / "files" / "input"
+
+
+def test_read_chunks_matches_read():
+    file = INPUT_DIR / "PurchaseOrder_1.xlsx"
+    chunks = list(read_chunks(file, chunk_size=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks), read(file), check_dtype=False)
+
+
+def test_stream_file_rejects_po_line_gap_across_chunks(tmp_path):
+    file = tmp_path / "PurchaseOrder_gap.xlsx"
+    pd.DataFrame(
+        {
+            "PO Number": ["PO-1"] * 3,
+            "PO Line": [1, 2, 4],
+            "Item Code": ["A", "B", "C"],
+            "Description": ["a", "b", "c"],
+            "Ordered Qty": [1, 1, 1],
+            "Unit Price": [1.5, 2.0, 3.0],
+            "Total Amount": [1.5, 2.0, 3.0],
+        }
+    ).to_excel(file, index=False)
+
+    chunks = stream_file(file, PURCHASE_ORDER, chunk_size=2)
+    assert len(next(chunks)) == 2
+    with pytest.raises(RejectedFile) as rejected:
+        next(chunks)
+    assert rejected.value.event == "Failed Validation"
@@ -0,0 +1,176 @@
+# app/test/test_reports.py
+from datetime import timedelta
+import ingestors
+import money
+from models import PurchaseOrder, ReportJob
+import pandas as pd
+import reports
+from sqlalchemy import update
+
+
+def test_report_queue_keeps_one_job_per_purchase_order(db_session):
+    db_session.add_all([PurchaseOrder(id="PO-1"), PurchaseOrder(id="PO-2")])
+    db_session.flush()
+
+    assert reports.enqueue(db_session, "PO-1")
+    assert reports.enqueue(db_session, "PO-2")
+    assert not reports.enqueue(db_session, "PO-1")
+
+    claim = reports.claim(db_session, limit=5)
+    assert sorted(claim.purchase_order_ids) == ["PO-1", "PO-2"]
+    assert reports.claim(db_session).purchase_order_ids == []
+
+    # A purchase order can be queued again once its job has been claimed,
+    # which keeps the job when the claim is finished.
+    assert reports.enqueue(db_session, "PO-1")
+    reports.finish(db_session, claim)
+    assert reports.claim(db_session, limit=5).purchase_order_ids == ["PO-1"]
+
+
+def test_released_and_timed_out_jobs_are_claimed_again(db_session):
+    db_session.add_all([PurchaseOrder(id="PO-1"), PurchaseOrder(id="PO-2")])
+    db_session.flush()
+    reports.enqueue(db_session, "PO-1")
+    reports.enqueue(db_session, "PO-2")
+
+    claim = reports.claim(db_session, limit=1)
+    assert len(claim.purchase_order_ids) == 1
+    reports.release(db_session, claim)
+    claim = reports.claim(db_session, limit=5)
+    assert sorted(claim.purchase_order_ids) == ["PO-1", "PO-2"]
+
+    # Until their claim times out, e.g. because the worker died.
+    assert reports.claim(db_session, timeout_seconds=60).purchase_order_ids == []
+    db_session.execute(
+        update(ReportJob)
+        .where(ReportJob.purchase_order_id == "PO-1")
+        .values(claimed_at=ReportJob.claimed_at - timedelta(hours=1))
+    )
+    assert reports.claim(db_session, timeout_seconds=60).purchase_order_ids == ["PO-1"]
+
+
+def purchase_order_df() -> pd.DataFrame:
+    return money.parse_amounts(
+        pd.DataFrame(
+            {
+                "PO Number": ["PO-1"] * 2,
+                "PO Line": [1, 2],
+                "Item Code": ["A", "B"],
+                "Description": ["Apple", "Banana"],
+                "Ordered Qty": [2, 1],
+                "Unit Price": [1.5, 10.0],
+                "Total Amount": [3.0, 10.0],
+            }
+        )
+    )
+
+
+def invoice_df(invoice_number: str = "INV-1") -> pd.DataFrame:
+    return money.parse_amounts(
+        pd.DataFrame(
+            {
+                "Invoice Number": [invoice_number] * 2,
+                "PO Number": ["PO-1"] * 2,
+                "Item Code": ["A", "C"],
+                "Description": ["Apple", "Cherry"],
+                "Invoiced Qty": [1, 5],
+                "Unit Price": [1.5, 2.0],
+                "Total Amount": [1.5, 10.0],
+            }
+        )
+    )
+
+
+def test_report_data(db_session):
+    ingestors.purchase_order(db_session, purchase_order_df())
+    ingestors.invoice(db_session, invoice_df())
+    db_session.flush()
+
+    data = reports.report_data(db_session, ["PO-1"])["PO-1"]
+
+    assert data.summary.iloc[0].tolist() == [13.0, 1.5, -11.5, 2]
+    reconciliation = data.reconciliation_report
+    assert reconciliation["Item Code"].tolist() == ["A", "B"]
+    assert reconciliation["Price Variance"].iloc[0] == -1.5
+    assert reconciliation["Status / Comments"].tolist() == [
+        "Under-Invoiced",
+        "Item not in PO",
+    ]
+    assert data.items_not_in_purchase_order["item_code"].tolist() == ["C"]
+    assert data.purchase_order_lines_without_invoice["Item Code"].tolist() == ["B"]
+    assert data.purchase_order_lines["PO Line"].tolist() == [1, 2]
+    assert data.invoice_lines["Total Price"].tolist() == [1.5, 10.0]
+    assert data.previous_report_id is None
+
+
+def test_delta_report_data_only_covers_new_invoices(db_session):
+    ingestors.purchase_order(db_session, purchase_order_df())
+    ingestors.invoice(db_session, invoice_df("INV-1"))
+    reports.create_report_db_records(db_session, ["PO-1"])
+    ingestors.invoice(db_session, invoice_df("INV-2"))
+    db_session.flush()
+
+    data = reports.report_data(db_session, ["PO-1"], delta=True)["PO-1"]
+
+    assert data.previous_report_id is not None
+    assert set(data.invoice_lines["Invoice Number"]) == {"INV-2"}
+    assert data.items_not_in_purchase_order["invoice_id"].tolist() == ["INV-2"]
+    # Reconciliation is still cumulative.
+    assert data.reconciliation_report["Invoiced Qty"].iloc[0] == 2
+
+
+def test_report_data_partitions_by_purchase_order(db_session):
+    for id in ["PO-1", "PO-2"]:
+        ingestors.purchase_order(
+            db_session,
+            money.parse_amounts(
+                pd.DataFrame(
+                    {
+                        "PO Number": [id],
+                        "PO Line": [1],
+                        "Item Code": [f"{id}-A"],
+                        "Description": ["Apple"],
+                        "Ordered Qty": [1],
+                        "Unit Price": [1.0],
+                        "Total Amount": [1.0],
+                    }
+                )
+            ),
+        )
+    db_session.flush()
+
+    data = reports.report_data(db_session, ["PO-2", "PO-1", "PO-3"])
+
+    assert list(data) == ["PO-2", "PO-1", "PO-3"]
+    assert data["PO-1"].purchase_order_lines["Item Code"].tolist() == ["PO-1-A"]
+    assert data["PO-2"].purchase_order_lines["Item Code"].tolist() == ["PO-2-A"]
+    assert data["PO-3"].purchase_order_lines.empty
+
+
+def test_streamed_report_data(db_session):
+    ingestors.purchase_order(db_session, purchase_order_df())
+    ingestors.invoice(db_session, invoice_df("INV-1"))
+    ingestors.invoice(db_session, invoice_df("INV-2"))
+    db_session.flush()
+
+    data = reports.report_data(db_session, ["PO-1"], stream_chunk_rows=3)["PO-1"]
+
+    chunks = list(data.invoice_lines)
+    assert [len(chunk) for chunk in chunks] == [3, 1]
+    assert pd.concat(chunks)["Invoice Number"].tolist() == ["INV-1"] * 2 + ["INV-2"] * 2
+    # Iterating again reads the section again.
+    assert sum(len(chunk) for chunk in data.invoice_lines) == 4
+    assert data.items_not_in_purchase_order["invoice_id"].tolist() == ["INV-1", "INV-2"]
+
+
+def test_data_versions_change_with_new_invoices(db_session):
+    ingestors.purchase_order(db_session, purchase_order_df())
+    db_session.flush()
+    before = reports.data_versions(db_session, ["PO-1"])
+
+    ingestors.invoice(db_session, invoice_df())
+    db_session.flush()
+    after = reports.data_versions(db_session, ["PO-1"])
+
+    assert list(before) == ["PO-1"]
+    assert before != after
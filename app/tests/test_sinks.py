@@ -0,0 +1,81 @@
+# app/test/test_sinks.py
+import numpy as np
+import pandas as pd
+import pytest
+from reports import Chunks, ReportData
+import sinks
+
+
+def report_data() -> ReportData:
+    empty = {
+        name: pd.DataFrame(columns=list(schema))
+        for name, schema in sinks.SCHEMAS.items()
+    }
+    reconciliation_report = pd.DataFrame(
+        {
+            "PO Number": ["PO-1"],
+            "Item Code": ["A"],
+            "Ordered Qty": [2],
+            # No invoices for the item yet.
+            "Invoiced Qty": [np.nan],
+            "Qty Variance": [np.nan],
+            "Ordered Price": [3.0],
+            "Invoiced Price": [pd.NA],
+            "Price Variance": [pd.NA],
+            "Status / Comments": ["Item not in PO"],
+        }
+    )
+    return ReportData(**{**empty, "reconciliation_report": reconciliation_report})
+
+
+def test_sections_have_stable_schemas():
+    for name, chunks in sinks.sections(report_data()).items():
+        for df in chunks:
+            assert df.dtypes.astype(str).to_dict() == sinks.SCHEMAS[name]
+
+
+def test_xlsx_sink_writes_chunked_sections(tmp_path):
+    invoice_lines = pd.DataFrame(
+        {
+            "PO Number": ["PO-1"] * 3,
+            "Item Code": ["A", "B", "C"],
+            "Description": ["Apple", "Banana", "Cherry"],
+            "Invoiced Qty": [1, 2, 3],
+            "Unit Price": [1.5, 2.0, 2.5],
+            "Total Price": [1.5, 4.0, 7.5],
+            "Invoice Number": ["INV-1"] * 3,
+        }
+    )
+    data = report_data()._replace(
+        invoice_lines=Chunks(lambda: iter([invoice_lines[:2], invoice_lines[2:]]))
+    )
+
+    file = sinks.write("xlsx", tmp_path / "report_PO-1", data)
+
+    sheets = pd.read_excel(file, sheet_name=None)
+    assert list(sheets) == list(sinks.SHEET_NAMES.values())
+    pd.testing.assert_frame_equal(
+        sheets["Raw Data -- Invoice Lines"], invoice_lines, check_dtype=False
+    )
+    assert sheets["Reconciliation Report"]["Invoiced Qty"].tolist() == ["--"]
+
+
+def test_csv_sink_writes_every_section(tmp_path):
+    directory = sinks.write("csv", tmp_path / "report_PO-1", report_data())
+
+    assert sorted(file.stem for file in directory.iterdir()) == sorted(sinks.SCHEMAS)
+    reconciliation_report = pd.read_csv(directory / "reconciliation_report.csv")
+    assert reconciliation_report["Ordered Qty"].tolist() == [2]
+
+
+def test_parquet_sink_keeps_schema(tmp_path):
+    pytest.importorskip("pyarrow")
+    directory = sinks.write("parquet", tmp_path / "report_PO-1", report_data())
+
+    df = pd.read_parquet(directory / "reconciliation_report.parquet")
+    assert df.dtypes.astype(str).to_dict() == sinks.SCHEMAS["reconciliation_report"]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        sinks.write("ods", tmp_path / "report_PO-1", report_data())
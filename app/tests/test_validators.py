@@ -0,0 +1,68 @@
+# app/test/test_validators.py
+import money
+import pandas as pd
+import validators
+
+
+def purchase_order_df(**overrides) -> pd.DataFrame:
+    data = {
+        "PO Number": ["PO-1"] * 3,
+        "PO Line": [1, 2, 3],
+        "Item Code": ["A", "B", "C"],
+        "Description": ["a", "b", "c"],
+        "Ordered Qty": [1, 2, 3],
+        "Unit Price": [1.5, 0.1, 2.25],
+        "Total Amount": [1.5, 0.2, 6.75],
+    }
+    data.update(overrides)
+    return money.parse_amounts(pd.DataFrame(data))
+
+
+def test_valid_purchase_order():
+    assert validators.purchase_order(purchase_order_df()).ok
+
+
+def test_reports_every_failing_rule_and_row():
+    df = purchase_order_df(
+        **{
+            "PO Number": ["PO-1", "PO-2", "PO-1"],
+            "Item Code": ["A", "B", "A"],
+            "Unit Price": [1.5, 0.101, 2.25],
+        }
+    )
+    result = validators.purchase_order(df)
+
+    assert not result.ok
+    assert {failure.rule: failure.rows for failure in result.failures} == {
+        "PO Number is constant": [1],
+        "Item Code is unique": [2],
+        "Unit Price has at most two decimal places": [1],
+        "Ordered Qty x Unit Price = Total Amount": [1],
+    }
+
+
+def test_totals_are_exact():
+    # 3 x 0.1 != 0.3 in floating point.
+    df = purchase_order_df(**{"Unit Price": [0.1] * 3, "Total Amount": [0.1, 0.2, 0.3]})
+    assert validators.purchase_order(df).ok
+
+
+def test_non_numeric_values_fail():
+    df = purchase_order_df(**{"Ordered Qty": [1, "two", 3]})
+    result = validators.purchase_order(df)
+
+    assert [failure.rows for failure in result.failures] == [[1], [1]]
+
+
+def test_rules_span_chunks():
+    df = purchase_order_df(**{"Item Code": ["A", "B", "A"]})
+    state = validators.StreamState()
+
+    assert validators.purchase_order(df.iloc[:2], state).ok
+    result = validators.purchase_order(df.iloc[2:], state)
+    assert result.failures == [validators.RuleFailure("Item Code is unique", [2])]
+
+    state = validators.StreamState()
+    validators.purchase_order(df.iloc[:1], state)
+    result = validators.purchase_order(df.iloc[2:], state)
+    assert result.failures[0].rule == "PO Line is sequential"
@@ -0,0 +1,19 @@
+-- Purchase orders waiting for a report. The primary key keeps at most one
+-- pending job per purchase order, however many files arrive for it.
+CREATE TABLE report_job (
+    purchase_order_id TEXT PRIMARY KEY,
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    -- Set while a worker is generating the report, see `reports.claim`.
+    claimed_at TIMESTAMP,
+
+    FOREIGN KEY (purchase_order_id)
+        REFERENCES purchase_order (id)
+        ON DELETE CASCADE
+);
+
+
+-- Create Indexes
+-- Workers claim the oldest job first.
+CREATE INDEX idx_report_job_created_at
+    ON report_job(created_at);
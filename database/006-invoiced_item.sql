@@ -0,0 +1,35 @@
+-- Running totals of what has been invoiced against each purchase order, per
+-- item (and description, as invoices may describe the same item differently).
+-- Kept up to date by the invoice ingestor in the same transaction as the
+-- invoice lines, so reconciliation doesn't re-aggregate every invoice line.
+CREATE TABLE invoiced_item (
+    purchase_order_id TEXT NOT NULL,
+    item_code TEXT NOT NULL,
+    description TEXT NOT NULL,
+    quantity BIGINT NOT NULL,
+    total_price NUMERIC(14, 2) NOT NULL,
+
+    PRIMARY KEY (purchase_order_id, item_code, description),
+
+    FOREIGN KEY (purchase_order_id)
+        REFERENCES purchase_order (id)
+        ON DELETE CASCADE
+);
+
+
+-- Backfill from invoices ingested before this table existed.
+INSERT INTO invoiced_item (
+    purchase_order_id, item_code, description, quantity, total_price
+)
+SELECT
+    invoice.purchase_order_id,
+    invoice_line_item.item_code,
+    invoice_line_item.description,
+    SUM(invoice_line_item.quantity),
+    SUM(invoice_line_item.total_price)
+FROM invoice_line_item
+JOIN invoice ON invoice.id = invoice_line_item.invoice_id
+GROUP BY
+    invoice.purchase_order_id,
+    invoice_line_item.item_code,
+    invoice_line_item.description;
@@ -0,0 +1,3 @@
+-- Delta reports look up whether an invoice has been covered by any report.
+CREATE INDEX idx_report_invoice_invoice_id
+    ON report_invoice(invoice_id);
@@ -0,0 +1,12 @@
+-- Content-addressed index of every input file that has been dealt with, so
+-- a file dropped again (under any name) is recognised from its hash before
+-- it is parsed. Rows for ingested files are committed with the data they
+-- loaded; rows for rejected files record why they were skipped.
+CREATE TABLE ingested_file (
+    sha256 TEXT PRIMARY KEY,
+    size BIGINT NOT NULL,
+    file_name TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
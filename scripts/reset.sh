@@ -1,3 +1,5 @@
 docker-compose --profile dev down -v
 mv app/files/output/ingested/* app/files/input
-rm app/files/output/reports/*
\ No newline at end of file
+rm -rf app/files/output/duplicates
+rm -r app/files/output/reports/*
+rm -rf app/files/cache